@@ -0,0 +1,171 @@
+"""수신 경로 복사량 벤치마크
+
+큰 파일 하나를 프레임으로 쪼갠 뒤 EthernetLayer -> IPLayer -> FileAppLayer 수신 경로에
+흘려보내고, 수신 바이트당 복사된 바이트 수를 측정한다.
+'before'는 memoryview 도입 이전의 슬라이스/join 방식을 그대로 재현한 경로다.
+
+tracemalloc 할당량에는 프레임마다 생기는 작은 객체(튜플, 헤더 필드 등)도 섞이므로,
+같은 파일을 두 가지 MTU로 보내서 '프레임당 고정 할당'과 '바이트당 복사량'을 분리한다.
+    총 할당 = 프레임 수 * 고정 할당 + 복사량 * 파일 크기
+
+    python bench/rx_copy_bench.py --size 20000000
+"""
+import os
+import sys
+import time
+import struct
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from layers.IPLayer import IPLayer
+from layers.EthernetLayer import EthernetLayer
+from layers.FileAppLayer import FileAppLayer
+
+SRC_MAC = b'\x02\x00\x00\x00\x00\x01'
+DST_MAC = b'\x02\x00\x00\x00\x00\x02'
+SRC_IP = b'\x0a\x00\x00\x01'
+DST_IP = b'\x0a\x00\x00\x02'
+
+
+class FrameSink:
+    def __init__(self, mtu):
+        self.mtu = mtu
+        self.frames = []
+
+    def get_mtu(self):
+        return self.mtu
+
+    def send(self, frame):
+        self.frames.append(bytes(frame))
+        return True
+
+    def send_many(self, frames):
+        self.frames.extend(bytes(f) for f in frames)
+        return True
+
+
+def build_frames(data, mtu):
+    """송신 스택으로 파일 전송 프레임을 미리 만들어 둠"""
+    sink = FrameSink(mtu)
+    eth = EthernetLayer()
+    ip_layer = IPLayer()
+    eth.set_lower(sink)
+    ip_layer.set_lower(eth)
+    eth.set_src_mac(SRC_MAC)
+    eth.set_dst_mac(DST_MAC)
+    ip_layer.set_src_ip(SRC_IP)
+    ip_layer.set_dst_ip(DST_IP)
+    ip_layer.MTU = mtu
+    # 피어 MTU를 미리 지정해 PMTU 협상(HELLO 프레임)이 섞이지 않게 함
+    ip_layer.set_path_mtu(DST_IP, mtu)
+    ip_layer.TX_BATCH = 1 << 30  # 벤치마크에서는 송신 간격 없이 한 번에 생성
+    ip_layer.send(data, protocol=IPLayer.PROTOCOL_FILE)
+    return sink.frames
+
+
+class LegacyRx:
+    """이전 수신 경로 (계층마다 bytes 슬라이스, 마지막에 sort + join)"""
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.rx_buffer = {}
+
+    def eth_recv(self, data):
+        if data[12:14] not in (b'\xFF\xFF', b'\x08\x06'):
+            return
+        if data[0:6] != DST_MAC:
+            return
+        self.ip_recv(data[14:])
+
+    def ip_recv(self, data):
+        src_ip, dst_ip, proto, pkt_id, offset, length, mf = struct.unpack('!4s4sBHIIB', data[:20])
+        if proto != IPLayer.PROTOCOL_FILE:
+            return
+        payload = data[20 : 20 + length]
+        key = (src_ip, pkt_id)
+        entry = self.rx_buffer.setdefault(key, {'fragments': [], 'received_len': 0, 'total_len': None})
+        for frag in entry['fragments']:
+            if frag[0] == offset:
+                return
+        entry['fragments'].append((offset, payload))
+        entry['received_len'] += len(payload)
+        if mf == 0:
+            entry['total_len'] = offset + len(payload)
+        if entry['total_len'] is not None and entry['received_len'] == entry['total_len']:
+            entry['fragments'].sort(key=lambda x: x[0])
+            reassembled = b''.join(f[1] for f in entry['fragments'])
+            del self.rx_buffer[key]
+            self.file_recv(reassembled)
+
+    def file_recv(self, data):
+        name_len = struct.unpack('!I', data[:4])[0]
+        file_name = data[4 : 4 + name_len].decode('utf-8', errors='ignore')
+        content = data[4 + name_len :]
+        with open(os.path.join(self.out_dir, file_name), 'wb') as f:
+            f.write(content)
+
+
+def build_current_rx(out_dir):
+    eth = EthernetLayer()
+    ip_layer = IPLayer()
+    file_app = FileAppLayer()
+    file_app.recv_dir = out_dir
+    eth.set_upper(ip_layer)
+    ip_layer.register_upper(IPLayer.PROTOCOL_FILE, file_app)
+    eth.set_src_mac(DST_MAC)
+    ip_layer.set_src_ip(DST_IP)
+    return eth.recv
+
+
+def measure(recv, frames):
+    """프레임마다 할당 최고치 증가분을 합산 -> 그 프레임 처리 중 새로 할당한 바이트 수"""
+    allocated = 0
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for frame in frames:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        recv(frame)
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - before
+    elapsed = time.perf_counter() - t0
+    tracemalloc.stop()
+    return allocated, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=20_000_000, help='file size in bytes')
+    parser.add_argument('--mtu', type=int, nargs=2, default=[1480, 8980],
+                        help='two IP MTUs used to separate per-frame overhead')
+    args = parser.parse_args()
+
+    name = b'bench.bin'
+    data = struct.pack('!I', len(name)) + name + os.urandom(args.size)
+
+    # 로그 출력이 할당량에 섞이지 않도록 devnull로 버림
+    devnull = open(os.devnull, 'w')
+    runs = {'before': [], 'after': []}
+    with tempfile.TemporaryDirectory() as out_dir:
+        for mtu in args.mtu:
+            with contextlib.redirect_stdout(devnull):
+                frames = build_frames(data, mtu)
+                legacy = LegacyRx(out_dir)
+                cur_recv = build_current_rx(out_dir)
+                runs['before'].append((len(frames), measure(legacy.eth_recv, frames)))
+                runs['after'].append((len(frames), measure(cur_recv, frames)))
+
+    print(f'file {args.size} bytes, MTU {args.mtu[0]} / {args.mtu[1]}')
+    for label, ((n1, (a1, t1)), (n2, (a2, t2))) in runs.items():
+        per_frame = (a1 - a2) / (n1 - n2)
+        copies = (a1 - n1 * per_frame) / len(data)
+        print(f'{label:>6}: {copies:5.2f} bytes copied per byte received, '
+              f'{per_frame:6.0f} B fixed alloc per frame, '
+              f'{t1:.3f}s @ {n1} frames (tracemalloc on)')
+
+
+if __name__ == '__main__':
+    main()
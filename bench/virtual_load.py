@@ -0,0 +1,206 @@
+"""가상 링크 부하 테스트
+
+VirtualSwitch 하나에 main.py와 같은 구성의 피어 스택
+(ChatAppLayer/FileAppLayer -> IPLayer -> ARPLayer -> EthernetLayer -> VirtualPhysicalLayer)을
+여러 개 붙이고, 각 피어가 다음 피어에게 채팅 메시지(옵션으로 파일)를 보내 처리량과 지연을 측정한다.
+목적지 MAC은 주지 않으므로 첫 송신은 ARP 해석을 거치고, 채팅 로그 기록도 실제로 수행된다.
+로그/수신 파일은 임시 디렉터리에 쓰고 끝나면 지운다. 루트 권한, 실제 NIC, scapy 없이 실행된다.
+
+    python bench/virtual_load.py --peers 50 --messages 200 --size 4000 --file-size 1000000
+"""
+import os
+import sys
+import io
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from layers.ChatappLayer import ChatAppLayer
+from layers.FileAppLayer import FileAppLayer
+from layers.IPLayer import IPLayer
+from layers.ARPLayer import ARPLayer
+from layers.EthernetLayer import EthernetLayer
+from layers.VirtualPhysicalLayer import VirtualSwitch, VirtualPhysicalLayer
+
+class BenchGUI:
+    """GUI 대신 붙이는 기록용 객체
+
+    수신 메시지 앞에 실린 송신 시각(perf_counter)으로 지연을, 파일 수신 완료 시각으로
+    파일 전송 시간을 기록한다. 나머지 GUI 메서드는 아무것도 하지 않는다.
+    """
+    def __init__(self):
+        self.latencies = []
+        self.bytes = 0
+        self.files = []
+        self.lock = threading.Lock()
+
+    def display_message(self, sender, text, msg_id=None):
+        if sender != 'RCVD':
+            return
+        now = time.perf_counter()
+        sent_at = float(text.split(' ', 1)[0])
+        with self.lock:
+            self.latencies.append(now - sent_at)
+            self.bytes += len(text)
+
+    def on_file_received_msg(self, path):
+        with self.lock:
+            self.files.append((time.perf_counter(), os.path.getsize(path)))
+
+    def _ignore(self, *args, **kwargs):
+        pass
+
+    set_send_callback = set_mac_callback = set_ip_callback = set_delete_msg_callback = _ignore
+    clear_chat = remove_message_ui = set_status = display_image = on_file_sent_msg = _ignore
+
+
+def build_peer(switch, idx, bandwidth, latency, workdir):
+    mac = bytes([0x02, 0, 0, 0, idx >> 8, idx & 0xFF])
+    ip = bytes([10, 0, idx >> 8, idx & 0xFF])
+
+    gui = BenchGUI()
+    chat_app = ChatAppLayer()
+    file_app = FileAppLayer()
+    ip_layer = IPLayer()
+    arp = ARPLayer()
+    eth = EthernetLayer()
+    phy = VirtualPhysicalLayer(switch, bandwidth_bps=bandwidth, latency=latency)
+
+    # main.py와 같은 구성
+    chat_app.set_lower(ip_layer)
+    file_app.set_lower(ip_layer)
+    ip_layer.register_upper(IPLayer.PROTOCOL_CHAT, chat_app)
+    ip_layer.register_upper(IPLayer.PROTOCOL_FILE, file_app)
+    ip_layer.set_streaming(IPLayer.PROTOCOL_FILE, True)
+    ip_layer.set_lower(arp)
+    arp.set_upper(ip_layer)
+    arp.set_lower(eth)
+    eth.set_upper(arp)
+    eth.set_lower(phy)
+    phy.set_upper(eth)
+    chat_app.set_gui(gui)
+    file_app.set_gui(gui)
+
+    # 피어마다 받은 파일 위치를 나눔 (같은 작업 디렉터리를 씀)
+    file_app.recv_dir = os.path.join(workdir, f'files_{idx}')
+    os.makedirs(file_app.recv_dir, exist_ok=True)
+
+    eth.set_src_mac(mac)
+    ip_layer.set_src_ip(ip)
+    arp.set_src_info(ip, mac)
+    phy.start()
+    return {'mac': mac, 'ip': ip, 'gui': gui, 'chat_app': chat_app, 'file_app': file_app,
+            'ip_layer': ip_layer, 'arp': arp, 'phy': phy}
+
+
+def set_peer(peer, dst):
+    """GUI에서 상대를 고른 것과 같게 설정. MAC은 IPLayer에 주지 않아 ARP로 해석됨"""
+    peer['chat_app'].current_peer_mac = ':'.join(f'{b:02x}' for b in dst['mac'])
+    peer['chat_app'].gui_set_ip_handler('.'.join(str(b) for b in dst['ip']))
+
+
+def run(args, workdir):
+    switch = VirtualSwitch()
+    peers = [build_peer(switch, i + 1, args.bandwidth, args.latency, workdir)
+             for i in range(args.peers)]
+
+    padding = 'x' * max(0, args.size - 20)
+    file_paths = []
+    if args.file_size:
+        src_dir = os.path.join(workdir, 'src')
+        os.makedirs(src_dir, exist_ok=True)
+        for i in range(len(peers)):
+            path = os.path.join(src_dir, f'bench_{i + 1}.bin')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(args.file_size))
+            file_paths.append(path)
+
+    # 피어 i -> 피어 i+1 (링 구성)
+    for i, p in enumerate(peers):
+        set_peer(p, peers[(i + 1) % len(peers)])
+
+    def sender(i, peer):
+        dst = peers[(i + 1) % len(peers)]
+        if file_paths:
+            peer['file_app'].send(file_paths[i], dst_ip=dst['ip'])
+        for _ in range(args.messages):
+            peer['chat_app'].gui_send_handler(f'{time.perf_counter():.9f} {padding}')
+
+    expected = args.peers * args.messages
+    expected_files = len(file_paths)
+    threads = [threading.Thread(target=sender, args=(i, p)) for i, p in enumerate(peers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    deadline = time.perf_counter() + args.drain
+    while time.perf_counter() < deadline:
+        if sum(len(p['gui'].latencies) for p in peers) >= expected and \
+                sum(len(p['gui'].files) for p in peers) >= expected_files:
+            break
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - t0
+
+    for p in peers:
+        p['chat_app'].close()
+        p['arp'].close()
+        p['phy'].close()
+
+    lat = sorted(l for p in peers for l in p['gui'].latencies)
+    total_bytes = sum(p['gui'].bytes for p in peers)
+    files = [(ts - t0, size) for p in peers for ts, size in p['gui'].files]
+    arp_stats = {'requests': sum(p['arp'].get_cache_stats()['requests'] for p in peers)}
+    return elapsed, expected, lat, total_bytes, files, expected_files, arp_stats, switch.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--peers', type=int, default=50)
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--size', type=int, default=1000, help='message size in bytes')
+    parser.add_argument('--file-size', type=int, default=0, help='also send one file of this size per peer')
+    parser.add_argument('--bandwidth', type=float, default=None, help='per-port link rate in bits/sec')
+    parser.add_argument('--latency', type=float, default=0.0, help='per-port one-way latency in seconds')
+    parser.add_argument('--drain', type=float, default=10.0, help='max seconds to wait for delivery')
+    parser.add_argument('--verbose', action='store_true', help='keep per-layer log output')
+    args = parser.parse_args()
+
+    # ChatAppLayer/FileAppLayer는 작업 디렉터리 아래 logs/, files/에 쓰므로 임시 디렉터리에서 실행
+    workdir = tempfile.mkdtemp(prefix='virtual_load_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        if args.verbose:
+            result = run(args, workdir)
+        else:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = run(args, workdir)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    elapsed, expected, lat, total_bytes, files, expected_files, arp_stats, sw = result
+
+    print(f'peers={args.peers} messages/peer={args.messages} size={args.size}B')
+    print(f'delivered {len(lat)}/{expected} in {elapsed:.3f}s '
+          f'({len(lat) / elapsed:.0f} msg/s, {total_bytes * 8 / elapsed / 1e6:.1f} Mbit/s)')
+    if lat:
+        pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000
+        print(f'latency ms: p50={pct(0.5):.2f} p90={pct(0.9):.2f} p99={pct(0.99):.2f} max={lat[-1] * 1000:.2f}')
+    if expected_files:
+        done = max((t for t, _ in files), default=0.0)
+        total = sum(size for _, size in files)
+        print(f'files {len(files)}/{expected_files} ({args.file_size}B each) done at {done:.3f}s '
+              f'({total * 8 / done / 1e6 if done else 0:.1f} Mbit/s)')
+    print(f'arp: {arp_stats}')
+    print(f'switch: {sw}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import ipaddress
+import threading
+import time
+from .Pacer import Pacer
+
+
+class ARPDiscovery:
+    """서브넷 전체에 ARP Request를 보내 피어를 찾는 탐색기 (ARPLayer 보조 클래스)
+
+    요청은 응답을 기다리지 않고 rate_pps 속도로 연달아 보내고(pacer 사용),
+    응답은 ARPLayer가 평소처럼 캐시에 학습하면서 리스너로 알려 주므로 찾는 즉시
+    on_host(ip_bytes, mac_bytes)로 전달한다. 응답이 없던 주소는 RETRIES번 다시 보낸다.
+    기본값(2000 pps)이면 /24(254개) 한 번 훑는 데 약 0.35초(송신 0.13초 + 응답 대기),
+    응답 없는 주소 재시도까지 포함해도 1초 안에 끝난다.
+    """
+    DEFAULT_RATE_PPS = 2000
+    BURST = 16
+    REPLY_WAIT = 0.2
+    RETRIES = 1
+    MAX_HOSTS = 4096   # /20보다 큰 범위는 거부 (세그먼트 폭주 방지)
+
+    def __init__(self, arp, rate_pps=DEFAULT_RATE_PPS):
+        self.arp = arp
+        self.pacer = Pacer(rate_pps=rate_pps, burst=self.BURST)
+        self._lock = threading.Lock()
+        self._targets = None
+        self._found = {}
+        self._on_host = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def set_rate(self, rate_pps):
+        self.pacer = Pacer(rate_pps=rate_pps, burst=self.BURST)
+
+    # ==== 탐색 ================================================================
+    def start(self, network=None, on_host=None, on_done=None):
+        """백그라운드 탐색 시작. network 생략 시 내 IP의 /24"""
+        if self._thread and self._thread.is_alive():
+            print('[ARP] Discovery 이미 진행 중')
+            return False
+        self._stop.clear()
+
+        def run():
+            found = self.sweep(network, on_host)
+            if on_done:
+                on_done(found)
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def sweep(self, network=None, on_host=None):
+        """network(예: '192.168.0.0/22')를 탐색하고 {ip_bytes: mac_bytes} 반환 (블록)"""
+        hosts = self._hosts(network)
+        if hosts is None:
+            return {}
+
+        with self._lock:
+            self._targets = set(hosts)
+            self._found = {}
+            self._on_host = on_host
+        self.arp.add_listener(self._on_reply)
+        started = time.monotonic()
+        try:
+            remaining = hosts
+            for _ in range(1 + self.RETRIES):
+                # BURST개씩 묶어 한 번에 송신 (물리 계층의 프레임별 로그/시스템 호출을 줄임)
+                for i in range(0, len(remaining), self.BURST):
+                    if self._stop.is_set():
+                        break
+                    chunk = remaining[i:i + self.BURST]
+                    self.pacer.acquire(len(chunk), 60 * len(chunk))
+                    self.arp.request_many(chunk)
+                # 마지막 요청의 응답까지 기다림
+                self._stop.wait(self.REPLY_WAIT)
+                with self._lock:
+                    remaining = [ip for ip in remaining if ip not in self._found]
+                if not remaining or self._stop.is_set():
+                    break
+        finally:
+            self.arp.remove_listener(self._on_reply)
+            with self._lock:
+                found = dict(self._found)
+                self._targets = None
+                self._on_host = None
+
+        print(f'[ARP] Discovery 완료: {len(hosts)}개 중 {len(found)}개 발견 '
+              f'({time.monotonic() - started:.2f}s)')
+        return found
+
+    def _hosts(self, network):
+        src_ip = self.arp.src_ip
+        try:
+            if network is None:
+                if not src_ip:
+                    raise ValueError('내 IP가 설정되지 않음')
+                network = ipaddress.ip_network(f'{ipaddress.IPv4Address(src_ip)}/24', strict=False)
+            else:
+                network = ipaddress.ip_network(network, strict=False)
+        except ValueError as e:
+            print(f'[ARP] Discovery 범위 오류: {e}')
+            return None
+        if network.num_addresses > self.MAX_HOSTS:
+            print(f'[ARP] Discovery 범위가 너무 큼: {network} (최대 {self.MAX_HOSTS}개)')
+            return None
+        return [h.packed for h in network.hosts() if h.packed != src_ip]
+
+    def _on_reply(self, ip, mac):
+        """ARPLayer 리스너 (수신 스레드에서 호출)"""
+        with self._lock:
+            if self._targets is None or ip not in self._targets or ip in self._found:
+                return
+            self._found[ip] = mac
+            on_host = self._on_host
+        if on_host:
+            try:
+                on_host(ip, mac)
+            except Exception as e:
+                print(f'[ARP] Discovery 콜백 오류: {e}')
+
+    def get_found(self):
+        with self._lock:
+            return dict(self._found)
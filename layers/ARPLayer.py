@@ -1,15 +1,58 @@
 from .BaseLayer import BaseLayer
-from scapy.all import Ether, ARP, sendp
+from .NeighborCache import NeighborCache
+from .ARPSnapshot import ArpSnapshot
+from collections import deque
+from concurrent.futures import Future
+import struct
 import threading
+import time
+
+
+class _Resolution:
+    """응답을 기다리는 IP 하나 (같은 IP에 대한 resolve 호출은 모두 이 Future를 공유)"""
+    __slots__ = ('future', 'deadline', 'next_retry', 'interval', 'pending')
+
+    def __init__(self, deadline, interval, now):
+        self.future = Future()
+        self.deadline = deadline
+        self.interval = interval
+        self.next_retry = now + interval
+        self.pending = deque()   # MAC을 알게 되면 호출할 send_func(mac)들
+
 
 class ARPLayer(BaseLayer):
+    ETHER_TYPE_ARP = b'\x08\x06'
+    OP_REQUEST = 1
+    OP_REPLY = 2
+    BROADCAST_MAC = b'\xFF' * 6
+    ZERO_MAC = b'\x00' * 6
+
+    # ARP (Ethernet/IPv4) 28바이트: htype, ptype, hlen, plen, op, sha, spa, tha, tpa
+    _ETH = struct.Struct('!6s6s2s')
+    _ARP = struct.Struct('!HHBBH6s4s6s4s')
+    _ARP_FIXED = b'\x00\x01\x08\x00\x06\x04'
+    _PAD = b'\x00' * (60 - 14 - 28)   # 최소 이더넷 프레임 60바이트
+
+    # resolve(): 응답 대기 시간과 재요청 간격 (RETRY_BASE부터 2배씩, 최대 RETRY_MAX)
+    RESOLVE_TIMEOUT = 2.0
+    RETRY_BASE = 0.2
+    RETRY_MAX = 1.0
+    # 주소 해석 중인 IP 하나당 보관할 송신 요청 수
+    PENDING_LIMIT = 64
+
     def __init__(self):
         super().__init__()
         self.src_ip = None
         self.src_mac = None
-        self.arp_table = {}
+        self.arp_table = NeighborCache()   # dict처럼 ip -> mac 조회 가능
         self.proxy_map = {}
         self.lock = threading.Lock()
+        self._req_tpl = None   # Request 프레임 템플릿 (set_src_info 시 생성)
+        self._resolving = {}   # ip -> _Resolution
+        self._res_cv = threading.Condition()
+        self._res_thread = None
+        self._listeners = []   # Reply 수신 시 호출할 fn(ip, mac) (ARPDiscovery 등)
+        self.snapshot = None   # enable_snapshot 시 ArpSnapshot
 
         # ==== [추가됨] Pass-through 메소드 (IPLayer의 요청을 EthernetLayer로 전달) ====
     def set_dst_mac(self, mac: bytes):
@@ -19,17 +62,38 @@ class ARPLayer(BaseLayer):
         else:
             print('[ARP] 경고: 하위 계층에 set_dst_mac이 없습니다.')
 
-    def send(self, data: bytes):
+    def send(self, data: bytes, dst_mac: bytes = None):
         """IPLayer에서 내려온 채팅 패킷을 그대로 EthernetLayer로 전달"""
         if self.lower:
-            return self.lower.send(data)
+            return self.lower.send(data, dst_mac=dst_mac)
         return False
+
+    def send_many(self, datas, dst_mac: bytes = None):
+        """IPLayer의 조각 묶음을 EthernetLayer로 전달"""
+        if self.lower and hasattr(self.lower, 'send_many'):
+            return self.lower.send_many(datas, dst_mac=dst_mac)
+        ok = True
+        for data in datas:
+            ok = self.send(data, dst_mac=dst_mac) and ok
+        return ok
+
+    def get_mtu(self):
+        """EthernetLayer의 링크 MTU 전달"""
+        if self.lower and hasattr(self.lower, 'get_mtu'):
+            return self.lower.get_mtu()
+        return None
+
+    def set_peer_mtu(self, dst_mac: bytes, mtu: int):
+        """IPLayer가 협상한 피어 MTU를 EthernetLayer로 전달"""
+        if self.lower and hasattr(self.lower, 'set_peer_mtu'):
+            self.lower.set_peer_mtu(dst_mac, mtu)
     # =========================================================================
 
     # ==== 설정 관련 (기존 동일) ================================================
     def set_src_info(self, ip_bytes: bytes, mac_bytes: bytes):
         self.src_ip = ip_bytes
         self.src_mac = mac_bytes
+        self._build_templates()
         print(f'[ARP] 내 정보 등록: IP={self._ip_str(ip_bytes)}, MAC={self._mac_str(mac_bytes)}')
 
     def add_proxy_entry(self, target_ip: bytes, owner_mac: bytes):
@@ -39,38 +103,195 @@ class ARPLayer(BaseLayer):
 
     # ==== 일반 ARP (기존 동일) =================================================
     def lookup(self, ip_bytes: bytes):
+        # STALE 항목은 MAC을 바로 돌려주고 재확인 요청만 보냄 (요청은 IP별 간격 제한)
+        mac, need_request = self.arp_table.lookup(ip_bytes)
+        if need_request:
+            if mac is None:
+                print(f'[ARP] 캐시 없음 -> {self._ip_str(ip_bytes)}에 대한 요청 전송 시도')
+            self.request(ip_bytes)
+        return mac
+
+    # ==== 이벤트 기반 주소 해석 ==================================================
+    def resolve(self, ip_bytes: bytes, timeout: float = None):
+        """MAC을 돌려줄 Future 반환. 응답을 recv에서 학습하는 즉시 완료되고,
+        timeout 안에 응답이 없으면 결과는 None. 같은 IP를 동시에 물으면 요청은 하나만 나간다.
+        """
+        timeout = self.RESOLVE_TIMEOUT if timeout is None else timeout
+        mac, need_request = self.arp_table.lookup(ip_bytes)
+        if mac is not None:
+            if need_request:
+                self.request(ip_bytes)
+            fut = Future()
+            fut.set_result(mac)
+            return fut
+
+        now = time.monotonic()
+        with self._res_cv:
+            res = self._resolving.get(ip_bytes)
+            if res is None:
+                res = self._resolving[ip_bytes] = _Resolution(now + timeout, self.RETRY_BASE, now)
+            else:
+                res.deadline = max(res.deadline, now + timeout)
+            self._res_cv.notify()
+        if need_request:
+            self.request(ip_bytes)
+        self._ensure_resolver()
+        return res.future
+
+    def send_when_resolved(self, ip_bytes: bytes, send_func, timeout: float = None):
+        """MAC을 알면 바로 send_func(mac), 모르면 응답이 올 때까지 보관했다가 호출
+
+        send_func(mac)의 반환값으로 완료되는 Future를 반환한다. 응답이 없거나(타임아웃)
+        대기열이 가득 차 버린 경우, send_func가 예외를 낸 경우에는 False로 완료된다.
+        보관 중인 요청은 응답 즉시 별도 스레드에서 순서대로 보낸다.
+        """
+        done = Future()
+        fut = self.resolve(ip_bytes, timeout)
+        with self._res_cv:
+            res = self._resolving.get(ip_bytes)
+            if res is not None and res.future is fut:
+                if len(res.pending) >= self.PENDING_LIMIT:
+                    print(f'[ARP] {self._ip_str(ip_bytes)} 대기열 가득 참 -> 패킷 버림')
+                    done.set_result(False)
+                else:
+                    res.pending.append((send_func, done))
+                return done
+        # 그 사이 해석이 끝난 경우
+        mac = fut.result()
+        if mac is None:
+            done.set_result(False)
+        else:
+            self._flush_pending([(send_func, done)], mac)
+        return done
+
+    def _ensure_resolver(self):
+        if self._res_thread is None or not self._res_thread.is_alive():
+            with self._res_cv:
+                if self._res_thread is None or not self._res_thread.is_alive():
+                    self._res_thread = threading.Thread(target=self._resolver_loop, daemon=True)
+                    self._res_thread.start()
+
+    def _resolver_loop(self):
+        """응답 없는 IP에 백오프로 재요청하고, 기한이 지나면 None으로 완료"""
+        while True:
+            retry, failed = [], []
+            with self._res_cv:
+                while not self._resolving:
+                    self._res_cv.wait()
+                now = time.monotonic()
+                wake = now + self.RETRY_MAX
+                for ip, res in list(self._resolving.items()):
+                    if now >= res.deadline:
+                        del self._resolving[ip]
+                        failed.append((ip, res))
+                        continue
+                    if now >= res.next_retry:
+                        retry.append(ip)
+                        res.interval = min(res.interval * 2, self.RETRY_MAX)
+                        res.next_retry = now + res.interval
+                    wake = min(wake, res.next_retry, res.deadline)
+                if not (retry or failed):
+                    self._res_cv.wait(max(0.0, wake - now))
+                    continue
+
+            for ip in retry:
+                self.request(ip)
+            for ip, res in failed:
+                if res.pending:
+                    print(f'[ARP] {self._ip_str(ip)} 응답 없음 -> 대기 패킷 {len(res.pending)}개 버림')
+                    for _, done in res.pending:
+                        done.set_result(False)
+                res.future.set_result(None)
+
+    def _on_learned(self, ip_bytes, mac):
+        """recv에서 MAC을 학습하면 기다리던 Future 완료 + 보관한 송신 요청 처리"""
+        with self._res_cv:
+            res = self._resolving.pop(ip_bytes, None)
+        if res is None:
+            return
+        if res.pending:
+            # 수신 스레드를 막지 않도록 별도 스레드에서 송신
+            threading.Thread(target=self._flush_pending, args=(list(res.pending), mac),
+                             daemon=True).start()
+        res.future.set_result(mac)
+
+    def _flush_pending(self, pending, mac):
+        for send_func, done in pending:
+            try:
+                done.set_result(send_func(mac))
+            except Exception as e:
+                print(f'[ARP] 대기 패킷 송신 실패: {e}')
+                done.set_result(False)
+
+    def add_listener(self, fn):
+        """ARP Reply를 받을 때마다 fn(ip_bytes, mac_bytes) 호출 (수신 스레드)"""
         with self.lock:
-            mac = self.arp_table.get(ip_bytes)
-        if mac:
-            return mac
-        print(f'[ARP] 캐시 없음 -> {self._ip_str(ip_bytes)}에 대한 요청 전송 시도')
-        self.request(ip_bytes)
-        return None
+            self._listeners = self._listeners + [fn]
+
+    def remove_listener(self, fn):
+        with self.lock:
+            self._listeners = [f for f in self._listeners if f is not fn]
 
-    def request(self, target_ip: bytes):
+    def set_cache_params(self, **params):
+        """reachable_time, stale_time, incomplete_time, retry_interval, max_entries 설정"""
+        self.arp_table.configure(**params)
+
+    def get_cache_stats(self):
+        return self.arp_table.get_stats()
+
+    # ==== 캐시 스냅샷 (재시작 시 바로 사용) ======================================
+    def enable_snapshot(self, iface, interval: float = None, snapshot_dir: str = None):
+        """iface별 파일에 캐시/프록시 표를 주기적으로 저장하고 지금 바로 복원"""
+        if self.snapshot is None:
+            self.snapshot = ArpSnapshot(self, snapshot_dir)
+        if interval is not None:
+            self.snapshot.interval = interval
+        self.snapshot.attach(iface)
+
+    def save_snapshot(self):
+        if self.snapshot:
+            return self.snapshot.save()
+        return False
+
+    def close(self):
+        """종료 시 스냅샷 마지막 저장"""
+        if self.snapshot:
+            self.snapshot.close()
+
+    def request(self, target_ip: bytes, quiet: bool = False):
         if not (self.src_ip and self.src_mac):
             return False
-        iface = self._get_iface()
-        if not iface:
+        if self._req_tpl is None:
+            self._build_templates()
+        # 템플릿(헤더 ~ 내 IP) 뒤에 대상 MAC(0)/IP만 붙임
+        frame = self._req_tpl + target_ip + self._PAD
+        if not self._send_frame(frame):
             return False
-
-        pkt = Ether(dst='ff:ff:ff:ff:ff:ff', src=self._mac_str(self.src_mac)) / \
-              ARP(op=1, hwsrc=self._mac_str(self.src_mac), psrc=self._ip_str(self.src_ip), pdst=self._ip_str(target_ip))
-        sendp(pkt, iface=iface, verbose=False)
-        print(f'[ARP] Request 송신: who-has {self._ip_str(target_ip)}?')
+        if not quiet:
+            print(f'[ARP] Request 송신: who-has {self._ip_str(target_ip)}?')
         return True
 
-    def reply(self, dst_ip, dst_mac, proxy_ip=None, proxy_mac=None):
-        iface = self._get_iface()
-        if not iface:
+    def request_many(self, target_ips):
+        """여러 IP에 대한 Request를 한 번에 송신 (탐색용, 로그 없음)"""
+        if not (self.src_ip and self.src_mac):
             return False
+        if self._req_tpl is None:
+            self._build_templates()
+        frames = [self._req_tpl + ip + self._PAD for ip in target_ips]
+        if self.lower and hasattr(self.lower, 'send_raw_many'):
+            return self.lower.send_raw_many(frames)
+        ok = True
+        for frame in frames:
+            ok = self._send_frame(frame) and ok
+        return ok
 
+    def reply(self, dst_ip, dst_mac, proxy_ip=None, proxy_mac=None):
         psrc_ip = proxy_ip or self.src_ip
         src_mac = proxy_mac or self.src_mac
 
-        pkt = Ether(dst=self._mac_str(dst_mac), src=self._mac_str(src_mac)) / \
-              ARP(op=2, hwsrc=self._mac_str(src_mac), psrc=self._ip_str(psrc_ip), hwdst=self._mac_str(dst_mac), pdst=self._ip_str(dst_ip))
-        sendp(pkt, iface=iface, verbose=False)
+        frame = self._pack_frame(dst_mac, src_mac, self.OP_REPLY, src_mac, psrc_ip, dst_mac, dst_ip)
+        if not self._send_frame(frame):
+            return False
         print(f'[ARP] Reply 송신: {self._ip_str(psrc_ip)} is-at {self._mac_str(src_mac)}')
         return True
 
@@ -78,62 +299,76 @@ class ARPLayer(BaseLayer):
     def send_gratuitous(self):
         if not (self.src_ip and self.src_mac):
             return False
-        iface = self._get_iface()
-        if not iface:
-            return False
 
-        pkt = Ether(dst='ff:ff:ff:ff:ff:ff', src=self._mac_str(self.src_mac)) / \
-              ARP(op=2, hwsrc=self._mac_str(self.src_mac), psrc=self._ip_str(self.src_ip), hwdst='00:00:00:00:00:00', pdst=self._ip_str(self.src_ip))
-        sendp(pkt, iface=iface, verbose=False)
+        frame = self._pack_frame(self.BROADCAST_MAC, self.src_mac, self.OP_REPLY,
+                                 self.src_mac, self.src_ip, self.ZERO_MAC, self.src_ip)
+        if not self._send_frame(frame):
+            return False
         print(f'[ARP] Gratuitous 송신: {self._ip_str(self.src_ip)} is-at {self._mac_str(self.src_mac)}')
         return True
 
-    def recv(self, data: bytes):
-        # 1. ARP 패킷으로 파싱 시도
-        try:
-            pkt = ARP(data)
-            if pkt.op not in [1, 2]:
-                raise ValueError('Not an ARP packet')
+    def recv(self, data: bytes, ether_type: bytes = None, src_mac: bytes = None):
+        # 1. EthernetLayer가 알려준 EtherType이 ARP가 아니면 파싱 없이 바로 상위(IP)로
+        if ether_type is not None and ether_type != self.ETHER_TYPE_ARP:
+            if self.upper:
+                return self.upper.recv(data, src_mac=src_mac)
+            return False
 
-            op = pkt.op
+        # EtherType을 모르는 하위 계층이면 ARP 고정 헤더(Ethernet/IPv4)로 판별
+        if len(data) < self._ARP.size or bytes(data[:6]) != self._ARP_FIXED:
+            if ether_type is None and self.upper:
+                return self.upper.recv(data, src_mac=src_mac)
+            return False
 
-            # [수정 중요] tuple(...) 대신 bytes(...)를 사용해야 함
-            # sender_ip = tuple(int(x) for x in pkt.psrc.split('.'))  <-- 기존 코드 (삭제)
-            sender_ip = bytes(map(int, pkt.psrc.split('.')))        # <-- 수정 코드
+        _, _, _, _, op, sender_mac, sender_ip, _, target_ip = self._ARP.unpack_from(data, 0)
 
-            sender_mac = bytes.fromhex(pkt.hwsrc.replace(':', ''))
+        if op == self.OP_REPLY:
+            # bytes 키로 저장되므로 GUI에서 조회 가능
+            self.arp_table.learn(sender_ip, sender_mac)
+            print(f'[ARP] 캐시 학습: {self._ip_str(sender_ip)} -> {self._mac_str(sender_mac)}')
+            self._on_learned(sender_ip, sender_mac)
+            for listener in self._listeners:
+                listener(sender_ip, sender_mac)
+            return True
 
-            # [수정 중요] 타겟 IP도 비교를 위해 bytes로 변환
-            # target_ip = tuple(int(x) for x in pkt.pdst.split('.'))  <-- 기존 코드 (삭제)
-            target_ip = bytes(map(int, pkt.pdst.split('.')))        # <-- 수정 코드
+        elif op == self.OP_REQUEST:
+            print(f'[ARP] Request 수신: who has {self._ip_str(target_ip)}? tell {self._ip_str(sender_ip)}')
+            # 이미 캐시에 있는 송신자는 MAC 갱신 (RFC 826), 새 항목은 만들지 않음
+            if self.arp_table.learn(sender_ip, sender_mac, create=False):
+                self._on_learned(sender_ip, sender_mac)
 
-            if op == 2:
-                with self.lock:
-                    # 이제 bytes 키로 저장되므로 GUI에서 조회 가능
-                    self.arp_table[sender_ip] = sender_mac
-                print(f'[ARP] 캐시 학습: {pkt.psrc} -> {pkt.hwsrc}')
+            if target_ip == self.src_ip:
+                self.reply(sender_ip, sender_mac)
                 return True
 
-            elif op == 1:
-                print(f'[ARP] Request 수신: who has {pkt.pdst}? tell {pkt.psrc}')
+            if target_ip in self.proxy_map:
+                proxy_mac = self.proxy_map[target_ip]
+                self.reply(sender_ip, sender_mac, proxy_ip=target_ip, proxy_mac=proxy_mac)
+                print(f'[ARP] Proxy ARP 응답: {self._ip_str(target_ip)} 대신 응답함')
+                return True
 
-                # [수정] target_ip가 이미 bytes이므로 tuple() 변환 제거
-                if target_ip == self.src_ip:  # tuple(self.src_ip) 제거
-                    self.reply(sender_ip, sender_mac)
-                    return True
+        return True
 
-                if target_ip in self.proxy_map:
-                    proxy_mac = self.proxy_map[target_ip]
-                    self.reply(sender_ip, sender_mac, proxy_ip=target_ip, proxy_mac=proxy_mac)
-                    print(f'[ARP] Proxy ARP 응답: {pkt.pdst} 대신 응답함')
-                    return True
+    # ==== 프레임 코덱 (struct) =================================================
+    def _pack_frame(self, eth_dst, eth_src, op, hwsrc, psrc, hwdst, pdst):
+        return self._ETH.pack(eth_dst, eth_src, self.ETHER_TYPE_ARP) + \
+               self._ARP.pack(1, 0x0800, 6, 4, op, hwsrc, psrc, hwdst, pdst) + self._PAD
 
-            return True
+    def _build_templates(self):
+        """내 MAC/IP가 바뀔 때 Request 프레임 앞부분을 미리 만들어 둠"""
+        if not (self.src_ip and self.src_mac):
+            self._req_tpl = None
+            return
+        frame = self._pack_frame(self.BROADCAST_MAC, self.src_mac, self.OP_REQUEST,
+                                 self.src_mac, self.src_ip, self.ZERO_MAC, b'\x00' * 4)
+        # 마지막 대상 IP(4)와 패딩을 뺀 부분
+        self._req_tpl = frame[:self._ETH.size + self._ARP.size - 4]
 
-        except Exception:
-            if self.upper:
-                return self.upper.recv(data)
-            return False
+    def _send_frame(self, frame):
+        """완성된 이더넷 프레임을 그대로 송신 (출발지 MAC이 프록시 MAC일 수 있음)"""
+        if self.lower and hasattr(self.lower, 'send_raw'):
+            return self.lower.send_raw(frame)
+        return False
 
     # ==== GUI 연동용 (기존 동일) ===============================================
     def add_proxy_entry_from_gui(self, ip_str, mac_str):
@@ -159,6 +394,7 @@ class ARPLayer(BaseLayer):
     def send_gratuitous_from_gui(self, mac_str):
         try:
             self.src_mac = bytes.fromhex(mac_str.replace(':', '').replace('-', ''))
+            self._build_templates()
             self.send_gratuitous()
             return True
         except Exception as e:
@@ -166,12 +402,6 @@ class ARPLayer(BaseLayer):
             return False
 
     # ==== 내부 유틸 함수 (기존 동일) ===========================================
-    def _get_iface(self):
-        if hasattr(self.lower, 'iface'):
-            return self.lower.iface
-        phy = getattr(self.lower, 'lower', None)
-        return getattr(phy, 'iface', None)
-
     @staticmethod
     def _ip_str(ip: bytes):
         return '.'.join(str(b) for b in ip)
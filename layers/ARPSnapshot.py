@@ -0,0 +1,150 @@
+import hashlib
+import os
+import struct
+import threading
+import time
+from .NeighborCache import STATE_STALE
+
+# 파일 형식: [magic(4)][version(1)][저장 시각(8)][캐시 수(2)][프록시 수(2)] + 항목 [ip(4)][mac(6)] ...
+HEADER = struct.Struct('!4sBdHH')
+ENTRY = struct.Struct('!4s6s')
+MAGIC = b'ARPS'
+VERSION = 1
+
+
+class ArpSnapshot:
+    """ARP 캐시/프록시 표를 인터페이스별 파일에 주기적으로 저장하고 시작 시 복원 (ARPLayer 보조 클래스)
+
+    복원한 캐시 항목은 STALE로 넣으므로 바로 사용하되, 첫 사용 시와 복원 직후
+    백그라운드 요청으로 다시 확인한다. 파일은 임시 파일에 쓴 뒤 os.replace로 바꿔
+    저장 도중 종료돼도 이전 스냅샷이 깨지지 않는다. 내용이 바뀌지 않았으면 쓰지 않는다.
+    """
+    DEFAULT_DIR = './arp_cache'
+    INTERVAL = 60.0
+    REVALIDATE_GAP = 0.01   # 복원 후 재확인 요청 간격 (초)
+
+    def __init__(self, arp, snapshot_dir=None, interval=INTERVAL):
+        self.arp = arp
+        self.snapshot_dir = snapshot_dir or self.DEFAULT_DIR
+        self.interval = interval
+        self.path = None
+        self._last_blob = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _path_for(self, iface):
+        fname = hashlib.sha256(str(iface).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.snapshot_dir, f'arp_{fname}.bin')
+
+    def attach(self, iface):
+        """iface용 스냅샷 사용 시작 (이전 인터페이스 것은 저장 후 교체)"""
+        path = self._path_for(iface)
+        with self._lock:
+            if path == self.path:
+                return
+            if self.path is not None:
+                self._save_locked()
+                # 다른 세그먼트의 이웃이므로 비움
+                self.arp.arp_table.clear()
+            self.path = path
+            self._last_blob = None
+        loaded = self.load()
+        if loaded:
+            threading.Thread(target=self._revalidate, args=(loaded,), daemon=True).start()
+        self._ensure_thread()
+
+    # ==== 저장 ================================================================
+    def _encode(self):
+        """헤더를 뺀 (캐시 수, 프록시 수, 항목 바이트)"""
+        cache = self.arp.arp_table.items()[-0xFFFF:]
+        with self.arp.lock:
+            proxies = list(self.arp.proxy_map.items())[-0xFFFF:]
+        body = b''.join(ENTRY.pack(ip, mac) for ip, mac in cache + proxies)
+        return len(cache), len(proxies), body
+
+    def save(self):
+        with self._lock:
+            return self._save_locked()
+
+    def _save_locked(self):
+        if self.path is None:
+            return False
+        blob = self._encode()
+        if blob == self._last_blob:
+            return True
+        n_cache, n_proxy, body = blob
+        data = HEADER.pack(MAGIC, VERSION, time.time(), n_cache, n_proxy) + body
+        tmp = self.path + '.tmp'
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f'[ARP] Snapshot 저장 실패: {e}')
+            return False
+        self._last_blob = blob
+        return True
+
+    # ==== 복원 ================================================================
+    def load(self):
+        """스냅샷을 읽어 캐시(STALE)와 프록시 표에 넣고, 복원한 캐시 IP 목록 반환"""
+        if self.path is None or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            magic, version, saved, n_cache, n_proxy = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('형식이 다름')
+            if len(data) < HEADER.size + (n_cache + n_proxy) * ENTRY.size:
+                raise ValueError('파일이 잘림')
+        except (OSError, ValueError, struct.error) as e:
+            print(f'[ARP] Snapshot 읽기 실패 ({self.path}): {e}')
+            return []
+
+        table = self.arp.arp_table
+        pos = HEADER.size
+        entries = [ENTRY.unpack_from(data, pos + i * ENTRY.size) for i in range(n_cache + n_proxy)]
+        cache, proxies = entries[:n_cache], entries[n_cache:]
+
+        # 너무 오래된 캐시는 어차피 만료됐을 것이므로 버림 (프록시 표는 설정이므로 유지)
+        age = time.time() - saved
+        if age >= table.reachable_time + table.stale_time:
+            cache = []
+
+        loaded = []
+        for ip, mac in cache:
+            if ip not in table and table.learn(ip, mac, state=STATE_STALE):
+                loaded.append(ip)
+        with self.arp.lock:
+            for ip, mac in proxies:
+                self.arp.proxy_map.setdefault(ip, mac)
+        print(f'[ARP] Snapshot 복원: 캐시 {len(loaded)}개, 프록시 {len(proxies)}개 ({age:.0f}초 전)')
+        return loaded
+
+    def _revalidate(self, ips):
+        """복원한 항목에 ARP Request를 천천히 보내 확인 (응답하면 REACHABLE)"""
+        for ip in ips:
+            if self._stop.is_set():
+                return
+            self.arp.request(ip, quiet=True)
+            time.sleep(self.REVALIDATE_GAP)
+
+    # ==== 주기 저장 ============================================================
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.save()
+
+    def close(self):
+        self._stop.set()
+        self.save()
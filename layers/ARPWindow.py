@@ -87,13 +87,18 @@ class TestArpDialog(tk.Toplevel):
     def _refresh_cache_tree(self):
         self.cache_tree.delete(*self.cache_tree.get_children())
         try:
-            # arp_table: dict[ip_bytes] = mac_bytes
-            for ip_b, mac_b in (self.arp.arp_table or {}).items():
+            # arp_table: NeighborCache (entries()로 incomplete/stale 상태까지 표시)
+            table = self.arp.arp_table
+            if hasattr(table, 'entries'):
+                rows = [(ip_b, mac_b, state) for ip_b, mac_b, state, _ in table.entries()]
+            else:
+                rows = [(ip_b, mac_b, 'complete') for ip_b, mac_b in (table or {}).items()]
+            for ip_b, mac_b, state in rows:
                 ip_str  = '.'.join(str(b) for b in ip_b)
                 if mac_b is None or (isinstance(mac_b, str) and '?' in mac_b):
                     mac_str, state = '?' * 18, 'incomplete'
                 else:
-                    mac_str, state = _mac_to_str(mac_b), 'complete'
+                    mac_str = _mac_to_str(mac_b)
                 self.cache_tree.insert('', 'end', values=(ip_str, mac_str, state))
         except Exception:
             pass
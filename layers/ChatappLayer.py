@@ -1,18 +1,28 @@
 from .BaseLayer import BaseLayer
 from .IPLayer import IPLayer
+from .LogStore import LogStore
+from .LogWriter import LogWriter
 import json
 import uuid
 import os
 import hashlib
+import threading
 from datetime import datetime
 
 class ChatAppLayer(BaseLayer):
+    # 상대를 바꿀 때 화면에 불러올 최근 메시지 수
+    HISTORY_LIMIT = 500
+
     def __init__(self):
         super().__init__()
         self.gui = None
         self.logs_dir = './logs'
         if not os.path.exists(self.logs_dir):
             os.makedirs(self.logs_dir)
+        self._log_stores = {}   # 파일 이름(해시) -> LogStore
+        self._log_stores_lock = threading.Lock()   # 수신 스레드/GUI 스레드가 같이 엶
+        # 로그는 쓰기 스레드가 모아서 기록 (수신 스레드는 큐에 넣기만 함)
+        self.log_writer = LogWriter()
 
         self.current_peer_mac = None
         self.current_peer_ip = None
@@ -24,51 +34,45 @@ class ChatAppLayer(BaseLayer):
         self.gui.set_ip_callback(self.gui_set_ip_handler)
         self.gui.set_delete_msg_callback(self.gui_delete_msg_handler)
 
-    def _get_log_filepath(self, mac_str, ip_str):
+    def _get_log_store(self, mac_str, ip_str):
+        """상대별 로그 저장소 (logs/<해시>/ 아래 세그먼트 파일, 처음 열 때 예전 <해시>.json 이전)"""
         if not mac_str or not ip_str: return None
         raw_str = f"{mac_str} - {ip_str}"
         fname = hashlib.sha256(raw_str.encode('utf-8')).hexdigest()
-        return os.path.join(self.logs_dir, f"{fname}.json")
-
-    def _read_log_file(self, fpath):
-        if not os.path.exists(fpath): return []
-        try:
-            with open(fpath, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if not content: return []
-                return json.loads(content)
-        except: return []
-
-    def _write_log_file(self, fpath, data_list):
-        try:
-            with open(fpath, 'w', encoding='utf-8') as f:
-                json.dump(data_list, f, ensure_ascii=False, indent=4)
-        except Exception as e:
-            print(f"[Log] Write Error: {e}")
+        with self._log_stores_lock:
+            store = self._log_stores.get(fname)
+            if store is None:
+                try:
+                    store = LogStore(os.path.join(self.logs_dir, fname),
+                                     legacy_path=os.path.join(self.logs_dir, f"{fname}.json"))
+                except OSError as e:
+                    print(f"[Log] Open Error: {e}")
+                    return None
+                self._log_stores[fname] = store
+        return store
 
     def _append_log(self, msg_data: dict):
-        fpath = self._get_log_filepath(self.current_peer_mac, self.current_peer_ip)
-        if not fpath: return
-        current_logs = self._read_log_file(fpath)
-        current_logs.append(msg_data)
-        self._write_log_file(fpath, current_logs)
+        store = self._get_log_store(self.current_peer_mac, self.current_peer_ip)
+        if not store: return
+        self.log_writer.submit(store, msg_data)
 
     def _delete_log_by_id(self, msg_id):
-        fpath = self._get_log_filepath(self.current_peer_mac, self.current_peer_ip)
-        if not fpath: return
-        current_logs = self._read_log_file(fpath)
-        new_logs = [msg for msg in current_logs if msg.get('id') != msg_id]
-        if len(new_logs) != len(current_logs):
-            self._write_log_file(fpath, new_logs)
+        store = self._get_log_store(self.current_peer_mac, self.current_peer_ip)
+        if not store: return
+        # 삭제 표시를 로그 큐에 넣음 (앞서 넣은 메시지 뒤에 순서대로 기록되고,
+        # 저장소가 모르는 id(상대가 보낸 잘못된 DEL 등)는 디스크에 쓰지 않음)
+        self.log_writer.submit(store, LogStore.tombstone(msg_id))
 
     def _load_history(self):
         if not self.gui: return
         self.gui.clear_chat()
 
-        fpath = self._get_log_filepath(self.current_peer_mac, self.current_peer_ip)
-        if not fpath: return
+        store = self._get_log_store(self.current_peer_mac, self.current_peer_ip)
+        if not store: return
 
-        logs = self._read_log_file(fpath)
+        # 화면에는 최근 HISTORY_LIMIT개만 (오래된 세그먼트는 읽지 않음)
+        self.log_writer.flush()
+        logs = store.tail(self.HISTORY_LIMIT)
         for data in logs:
             sender = data.get('sender', 'Unknown')
             msg_id = data.get('id')
@@ -86,6 +90,26 @@ class ChatAppLayer(BaseLayer):
                 text = data.get('text', '')
                 self.gui.display_message(sender, text, msg_id)
 
+    def set_log_policy(self, flush_interval=None, fsync=None, fsync_interval=None):
+        """로그 묶음 기록 간격(초)과 fsync 정책 (LogWriter.FSYNC_*)"""
+        if flush_interval is not None:
+            self.log_writer.flush_interval = flush_interval
+        if fsync is not None:
+            self.log_writer.fsync = fsync
+        if fsync_interval is not None:
+            self.log_writer.fsync_interval = fsync_interval
+
+    def get_log_stats(self):
+        return self.log_writer.get_stats()
+
+    def close(self):
+        """종료 시 남은 로그를 모두 기록하고 파일을 닫음"""
+        self.log_writer.close()
+        with self._log_stores_lock:
+            stores = list(self._log_stores.values())
+        for store in stores:
+            store.close()
+
     # --- [추가] 외부(FileAppLayer) 이벤트 로그 기록 메서드 ---
     def log_file_event(self, sender, file_rel_path, is_image=False):
         """GUI가 파일 송수신을 감지했을 때 호출"""
@@ -178,7 +202,7 @@ class ChatAppLayer(BaseLayer):
     def recv(self, data: bytes):
         if not self.gui: return False
         try:
-            decoded = data.decode('utf-8')
+            decoded = bytes(data).decode('utf-8')
             if not decoded.strip().startswith('{'):
                 self.gui.display_message('RCVD', decoded) # 구형 호환
                 return True
@@ -189,6 +213,10 @@ class ChatAppLayer(BaseLayer):
             if ptype == 'MSG':
                 msg_id = packet.get('id')
                 content = packet.get('content')
+                # 상대가 보낸 id는 로그 색인 키로 쓰이므로 문자열만 받음
+                if not isinstance(msg_id, str):
+                    print(f'[ChatApp] Recv Error: invalid message id {msg_id!r}')
+                    return False
                 log_data = {
                     "id": msg_id,
                     "sender": "PEER",
@@ -201,6 +229,9 @@ class ChatAppLayer(BaseLayer):
 
             elif ptype == 'DEL':
                 target_id = packet.get('target_id')
+                if not isinstance(target_id, str):
+                    print(f'[ChatApp] Recv Error: invalid delete target {target_id!r}')
+                    return False
                 self._delete_log_by_id(target_id)
                 self.gui.remove_message_ui(target_id)
 
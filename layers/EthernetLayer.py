@@ -1,55 +1,244 @@
 from .BaseLayer import BaseLayer
+import struct
+import threading
+import time
 
 class EthernetLayer(BaseLayer):
+    ETHER_TYPE_DATA = b'\xFF\xFF'    # IP/Chat
+    ETHER_TYPE_ARP = b'\x08\x06'
+    ETHER_TYPE_BUNDLE = b'\xFF\xFE'  # 작은 데이터그램 여러 개를 묶은 프레임: [길이 2B][데이터]...
+
+    ETH_MTU = 1500
+
     def __init__(self):
         super().__init__()
         self.src_mac = bytearray(6)
         self.dst_mac = bytearray(6)
+        self._src_mac_b = bytes(self.src_mac)  # 수신 비교용 (프레임마다 bytes 생성 방지)
+
+        # 작은 데이터그램 묶음 전송 (enable_coalescing으로 활성화)
+        self.coalescing = False
+        self.coalesce_delay = 0.002
+        self.coalesce_threshold = 512
+        self._pending = {}   # dst_mac -> [deadline, size, [datagram, ...]]
+        self._peer_mtu = {}  # dst_mac -> 협상한 피어 MTU (IPLayer가 set_peer_mtu로 알려줌)
+        self._pending_cv = threading.Condition()
+        self._flusher = None
+        self._flusher_stop = threading.Event()
+        self.coalesce_stats = {'datagrams': 0, 'bundles': 0, 'frames_saved': 0}
 
     def set_src_mac(self, mac: bytes):
         mac_str = ':'.join(f'{b:02x}' for b in mac)
         print(f'[ETH] Source MAC set to: {mac_str}')
         self.src_mac[:] = mac
+        self._src_mac_b = bytes(self.src_mac)
+        # 하위(Physical)가 커널 필터를 지원하면 내 MAC을 알려줌
+        if self.lower and hasattr(self.lower, 'set_rx_mac'):
+            self.lower.set_rx_mac(bytes(self.src_mac))
+
+    def get_mtu(self):
+        """하위(Physical)가 알려주는 링크 MTU (모르면 1500)"""
+        if self.lower and hasattr(self.lower, 'get_mtu'):
+            return self.lower.get_mtu()
+        return self.ETH_MTU
+
+    def set_peer_mtu(self, dst_mac: bytes, mtu: int):
+        """dst_mac으로 보낼 묶음 프레임의 최대 크기 (IPLayer가 협상한 경로 MTU)"""
+        self._peer_mtu[bytes(dst_mac)] = mtu
+
+    def _bundle_mtu(self, dst):
+        """묶음 프레임 최대 크기. 피어 MTU를 모르면 점보 링크라도 1500으로 제한"""
+        link = self.get_mtu()
+        mtu = self._peer_mtu.get(dst)
+        if mtu is None:
+            return min(link, self.ETH_MTU)
+        return min(link, mtu)
 
     def set_dst_mac(self, mac: bytes):
         mac_str = ':'.join(f'{b:02x}' for b in mac)
         print(f'[ETH] Destination MAC set to: {mac_str}')
         self.dst_mac[:] = mac
 
-    def send(self, data: bytes):
-        if not self.lower:
-            return False
-        ether_type = b'\xFF\xFF'
-        header = bytes(self.dst_mac) + bytes(self.src_mac) + ether_type
+    # ==== 작은 데이터그램 묶음 전송 ================================================
+    def enable_coalescing(self, max_delay: float = 0.002, threshold: int = 512):
+        """threshold 이하 데이터그램을 목적지별로 모아 MTU까지 한 프레임에 담아 전송
+
+        max_delay(초) 안에 프레임이 차지 않아도 모인 만큼 전송한다.
+        수신 측은 ETHER_TYPE_BUNDLE 프레임을 다시 개별 데이터그램으로 나눠 올린다.
+        """
+        self.coalesce_delay = max_delay
+        self.coalesce_threshold = threshold
+        self.coalescing = True
+        if self._flusher is None or not self._flusher.is_alive():
+            # 스레드마다 자기 종료 이벤트를 가짐 (끄고 바로 다시 켜도 새 스레드가 멈추지 않도록)
+            self._flusher_stop = threading.Event()
+            self._flusher = threading.Thread(target=self._flush_loop, args=(self._flusher_stop,),
+                                             daemon=True)
+            self._flusher.start()
+
+    def disable_coalescing(self):
+        """묶음 전송을 끄고 대기분을 보낸 뒤 flush 스레드 종료"""
+        self.coalescing = False
+        flusher = self._flusher
+        if flusher is not None:
+            with self._pending_cv:
+                self._flusher_stop.set()
+                self._pending_cv.notify_all()
+            if flusher is not threading.current_thread():
+                flusher.join()
+            self._flusher = None
+        self.flush()
+
+    def flush(self, dst_mac: bytes = None):
+        """대기 중인 묶음 즉시 전송 (dst_mac 생략 시 전체)"""
+        with self._pending_cv:
+            if dst_mac is None:
+                items = list(self._pending.items())
+                self._pending.clear()
+            else:
+                entry = self._pending.pop(dst_mac, None)
+                items = [(dst_mac, entry)] if entry else []
+        for dst, (_, _, datagrams) in items:
+            self._send_bundle(dst, datagrams)
+
+    def _enqueue_small(self, data, dst):
+        send_now = None
+        with self._pending_cv:
+            entry = self._pending.get(dst)
+            if entry and entry[1] + 2 + len(data) > self._bundle_mtu(dst):
+                # 프레임이 가득 참 -> 지금까지 모은 것을 먼저 전송
+                send_now = self._pending.pop(dst)[2]
+                entry = None
+            if entry is None:
+                entry = [time.monotonic() + self.coalesce_delay, 0, []]
+                self._pending[dst] = entry
+                self._pending_cv.notify()
+            entry[1] += 2 + len(data)
+            entry[2].append(bytes(data))
+        if send_now:
+            self._send_bundle(dst, send_now)
+        return True
+
+    def _send_bundle(self, dst, datagrams):
+        if len(datagrams) == 1:
+            return self.lower.send(self._build_frame(datagrams[0], dst))
+        payload = b''.join(struct.pack('!H', len(d)) + d for d in datagrams)
+        self.coalesce_stats['bundles'] += 1
+        self.coalesce_stats['frames_saved'] += len(datagrams) - 1
+        return self.lower.send(self._build_frame(payload, dst, self.ETHER_TYPE_BUNDLE))
+
+    def _flush_loop(self, stop):
+        while not stop.is_set():
+            with self._pending_cv:
+                now = time.monotonic()
+                due = [dst for dst, e in self._pending.items() if e[0] <= now]
+                items = [(dst, self._pending.pop(dst)[2]) for dst in due]
+                if not items:
+                    wait = min((e[0] for e in self._pending.values()), default=now + 1.0) - now
+                    if not stop.is_set():
+                        self._pending_cv.wait(max(wait, 0.0))
+                    continue
+            for dst, datagrams in items:
+                try:
+                    self._send_bundle(dst, datagrams)
+                except Exception as e:
+                    print(f'[ETH] bundle send error: {e}')
+
+    # ==== 송신 ================================================================
+    def _build_frame(self, data: bytes, dst_mac: bytes = None, ether_type: bytes = ETHER_TYPE_DATA):
+        dst = bytes(dst_mac) if dst_mac is not None else bytes(self.dst_mac)
+        header = dst + bytes(self.src_mac) + ether_type
         payload = data
         if len(payload) < 46:
             payload = payload + b'\x00' * (46 - len(payload))
-        frame = header + payload
+        return header + payload
+
+    def send_raw(self, frame: bytes):
+        """이미 완성된 프레임을 그대로 송신 (ARP 등 자체 헤더를 만드는 계층용)"""
+        if not self.lower:
+            return False
         return self.lower.send(frame)
 
+    def send_raw_many(self, frames):
+        """완성된 프레임 여러 개를 한 번에 송신 (하위 send_many 사용, 프레임별 로그 없음)"""
+        if not self.lower:
+            return False
+        if hasattr(self.lower, 'send_many'):
+            return self.lower.send_many(frames)
+        ok = True
+        for frame in frames:
+            ok = self.lower.send(frame) and ok
+        return ok
+
+    def send(self, data: bytes, dst_mac: bytes = None):
+        """dst_mac을 주면 이 프레임에만 적용, 생략하면 set_dst_mac으로 지정한 기본값 사용"""
+        if not self.lower:
+            return False
+        if self.coalescing:
+            dst = bytes(dst_mac) if dst_mac is not None else bytes(self.dst_mac)
+            if len(data) <= self.coalesce_threshold:
+                self.coalesce_stats['datagrams'] += 1
+                return self._enqueue_small(data, dst)
+            # 큰 데이터그램은 같은 목적지의 대기분을 먼저 보내 순서를 유지
+            self.flush(dst)
+        return self.lower.send(self._build_frame(data, dst_mac))
+
+    def send_many(self, datas, dst_mac: bytes = None):
+        """여러 페이로드를 프레임으로 만들어 한 번에 하위 계층으로 전달"""
+        if not self.lower:
+            return False
+        if self.coalescing:
+            self.flush(bytes(dst_mac) if dst_mac is not None else bytes(self.dst_mac))
+        frames = [self._build_frame(d, dst_mac) for d in datas]
+        if hasattr(self.lower, 'send_many'):
+            return self.lower.send_many(frames)
+        ok = True
+        for frame in frames:
+            ok = self.lower.send(frame) and ok
+        return ok
+
     def recv(self, data: bytes):
         if len(data) < 14:
             return False
-        dst = data[0:6]
-        src = data[6:12]
-        et = data[12:14]
+        # 헤더 필드만 작은 bytes로 꺼내고, 페이로드는 memoryview 슬라이스로 넘김 (복사 없음)
+        dst, src, et = struct.unpack_from('!6s6s2s', data, 0)
 
-        # ARP(0x0806)와 IP/Chat(0xFFFF) 모두 허용
-        if et != b'\xFF\xFF' and et != b'\x08\x06':
+        # ARP(0x0806)와 IP/Chat(0xFFFF), 묶음 프레임(0xFFFE) 허용
+        if et != self.ETHER_TYPE_DATA and et != self.ETHER_TYPE_ARP and et != self.ETHER_TYPE_BUNDLE:
             return False
 
         bcast = b'\xFF' * 6
-        if not (dst == bcast or dst == bytes(self.src_mac)):
+        if not (dst == bcast or dst == self._src_mac_b):
             return False
 
         # [수정] rstrip(b'\x00')을 삭제하여 바이너리 데이터 손상 방지
         # 뒤에 붙은 패딩(0x00)은 상위 계층(IPLayer)에서 길이 정보를 보고 잘라내야 함
-        payload = data[14:]
+        mv = data if isinstance(data, memoryview) else memoryview(data)
+        payload = mv[14:]
 
         if not payload:
             return False
 
+        if et == self.ETHER_TYPE_BUNDLE:
+            return self._recv_bundle(payload, src)
+
+        # EtherType을 함께 넘겨 ARP 계층이 IP 프레임을 파싱 없이 통과시키게 함
+        # 출발지 MAC도 프레임마다 넘김 (ACK/PMTU 응답용, 여러 수신 스레드가 동시에 불러도 안전)
         if self.upper:
-            self.upper.recv(payload)
+            self.upper.recv(payload, ether_type=et, src_mac=src)
             return True
-        return False
\ No newline at end of file
+        return False
+
+    def _recv_bundle(self, payload, src):
+        """묶음 프레임을 개별 데이터그램으로 나눠 상위 전달 (뒤쪽 0 패딩은 길이 0으로 끝남)"""
+        if not self.upper:
+            return False
+        pos, end = 0, len(payload)
+        while pos + 2 <= end:
+            n = struct.unpack_from('!H', payload, pos)[0]
+            pos += 2
+            if n == 0 or pos + n > end:
+                break
+            self.upper.recv(payload[pos : pos + n], ether_type=self.ETHER_TYPE_DATA, src_mac=src)
+            pos += n
+        return True
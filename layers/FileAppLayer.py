@@ -5,6 +5,9 @@ import threading
 from .IPLayer import IPLayer
 
 class FileAppLayer(BaseLayer):
+    # 파일명 최대 길이 (상대가 보낸 값이므로 스트리밍 수신 시 헤더 버퍼 크기를 제한)
+    MAX_NAME_LEN = 4096
+
     def __init__(self):
         super().__init__()
         self.gui = None
@@ -20,11 +23,18 @@ class FileAppLayer(BaseLayer):
             except Exception as e:
                 print(f"[FileApp] Failed to create dir: {e}")
 
+        # 스트리밍 수신 중인 파일 (IPLayer.set_streaming 사용 시)
+        self._streams = {}
+
     def set_gui(self, gui):
         self.gui = gui
 
-    def send(self, file_path):
-        """파일 전송 (스레드 처리)"""
+    def send(self, file_path, dst_ip=None, dst_mac=None):
+        """파일 전송 (스레드 처리)
+
+        목적지는 호출 시점에 고정되므로, 전송 도중 GUI에서 피어를 바꿔도
+        진행 중인 전송의 조각이 다른 피어로 가지 않는다.
+        """
         if not self.lower:
             print("[FileApp] Error: Lower layer is missing!")
             return False
@@ -33,11 +43,17 @@ class FileAppLayer(BaseLayer):
             print(f"[FileApp] Error: File not found {file_path}")
             return False
 
-        t = threading.Thread(target=self._send_thread, args=(file_path,))
+        if dst_ip is None and hasattr(self.lower, 'get_dst'):
+            cur_ip, cur_mac = self.lower.get_dst()
+            dst_ip = cur_ip
+            if dst_mac is None:
+                dst_mac = cur_mac
+
+        t = threading.Thread(target=self._send_thread, args=(file_path, dst_ip, dst_mac))
         t.start()
         return True
 
-    def _send_thread(self, file_path):
+    def _send_thread(self, file_path, dst_ip=None, dst_mac=None):
         try:
             file_name = os.path.basename(file_path)
             file_size = os.path.getsize(file_path)
@@ -56,8 +72,12 @@ class FileAppLayer(BaseLayer):
             if self.gui:
                 self.gui.set_status(f'Sending file: {file_name}...')
 
-            # IPLayer로 전송
-            self.lower.send(data, protocol=IPLayer.PROTOCOL_FILE)
+            # IPLayer로 전송 (신뢰 전송 모드면 상대가 모두 받을 때까지 블록)
+            if not self.lower.send(data, protocol=IPLayer.PROTOCOL_FILE, dst_ip=dst_ip, dst_mac=dst_mac):
+                print(f'[FileApp] Failed to send "{file_name}".')
+                if self.gui:
+                    self.gui.set_status(f'File send failed: {file_name}')
+                return
 
             print(f'[FileApp] Sent "{file_name}" successfully.')
             if self.gui:
@@ -90,8 +110,8 @@ class FileAppLayer(BaseLayer):
                 print(f"[FileApp] Error: Data truncated. Expected name len {name_len}, but data left is {len(data)-4}.")
                 return False
 
-            # 4. 파일명 및 내용 추출
-            file_name_raw = data[4 : 4 + name_len].decode('utf-8', errors='ignore')
+            # 4. 파일명 및 내용 추출 (data는 memoryview일 수 있음 -> 내용은 복사 없이 슬라이스)
+            file_name_raw = bytes(data[4 : 4 + name_len]).decode('utf-8', errors='ignore')
             file_name = os.path.basename(file_name_raw) # 경로 조작 방지
 
             # 파일명이 비어있거나 이상한 경우 기본값 처리
@@ -126,4 +146,81 @@ class FileAppLayer(BaseLayer):
             print(f'[FileApp] CRITICAL RECV ERROR: {e}')
             import traceback
             traceback.print_exc()
-            return False
\ No newline at end of file
+            return False
+
+    # ==== 스트리밍 수신 (IPLayer가 순서대로 이어지는 데이터를 바로 넘겨줌) ==========
+    # 디스크에 "<이름>.<ID>.part"로 바로 쓰고, 끝까지 받으면 원래 이름으로 바꿈
+    # -> 파일 크기와 관계없이 메모리는 재정렬 구간 만큼만 사용
+    def on_begin(self, key, src_ip):
+        self._streams[key] = {
+            'header': bytearray(),
+            'name': None,
+            'file': None,
+            'part_path': None,
+            'written': 0,
+            'error': None,
+        }
+
+    def on_data(self, key, offset, chunk):
+        st = self._streams.get(key)
+        if st is None or st['error']:
+            return
+        try:
+            if st['file'] is None:
+                # 헤더 [이름길이(4)][이름]이 여러 조각에 걸칠 수 있으므로 모일 때까지 보관
+                st['header'] += chunk
+                hdr = st['header']
+                if len(hdr) < 4:
+                    return
+                name_len = struct.unpack_from('!I', hdr, 0)[0]
+                if name_len > self.MAX_NAME_LEN:
+                    # 잘못된 길이면 파일 전체를 메모리에 모으게 되므로 바로 중단
+                    st['header'] = bytearray()
+                    raise ValueError(f'file name too long ({name_len} bytes)')
+                if len(hdr) < 4 + name_len:
+                    return
+                self._open_stream(key, st, bytes(hdr[4 : 4 + name_len]))
+                chunk = memoryview(hdr)[4 + name_len :]
+            st['file'].write(chunk)
+            st['written'] += len(chunk)
+        except Exception as e:
+            st['error'] = e
+            print(f'[FileApp] Stream write error: {e}')
+
+    def _open_stream(self, key, st, name_raw):
+        file_name = os.path.basename(name_raw.decode('utf-8', errors='ignore'))
+        if not file_name or file_name.strip() == '':
+            file_name = 'unknown_file.bin'
+        st['name'] = file_name
+        st['part_path'] = os.path.join(self.recv_dir, f'{file_name}.{key[1]}.part')
+        st['file'] = open(st['part_path'], 'wb')
+        print(f'[FileApp] Receiving "{file_name}" -> {st["part_path"]}')
+        if self.gui:
+            self.gui.set_status(f'Receiving file: {file_name}...')
+
+    def on_end(self, key, ok):
+        st = self._streams.pop(key, None)
+        if st is None:
+            return
+        f = st['file']
+        if f:
+            f.close()
+        part_path = st['part_path']
+
+        if not ok or st['error'] or part_path is None:
+            reason = st['error'] or ('header missing' if ok else 'incomplete')
+            print(f'[FileApp] Receive failed for "{st["name"]}": {reason}')
+            if part_path and os.path.exists(part_path):
+                os.remove(part_path)
+            if self.gui:
+                self.gui.set_status(f'File receive failed: {st["name"]}')
+            return
+
+        save_path = os.path.join(self.recv_dir, st['name'])
+        os.replace(part_path, save_path)
+        print(f'[FileApp] SUCCESS: Saved "{st["name"]}" ({st["written"]} bytes).')
+        if self.gui:
+            if hasattr(self.gui, 'on_file_received_msg'):
+                self.gui.on_file_received_msg(save_path)
+            else:
+                self.gui.display_message('FILE_RCVD', f'{st["name"]} (saved)')
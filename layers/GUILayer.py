@@ -6,7 +6,6 @@ import winreg
 import os
 import mimetypes
 import threading
-import time
 from PIL import Image, ImageTk # pip install pillow 필요
 from .ARPWindow import TestArpDialog
 
@@ -260,25 +259,13 @@ class GUI:
             ip_parts = ip_str.split('.')
             ip_bytes = bytes(int(p) for p in ip_parts)
 
-            # 1. ARP 요청 전송 (lookup은 캐시에 없으면 요청을 보냄)
-            # 이미 캐시에 있다면 즉시 리턴되지만, 없다면 None 리턴 후 내부적으로 Request 전송
-            cached_mac = self.arp.lookup(ip_bytes)
-
-            if cached_mac:
-                # 이미 캐시에 있는 경우 즉시 업데이트
-                self._update_peer_mac_gui(cached_mac)
+            # ARP 응답을 학습하는 즉시 완료되는 Future (캐시에 있으면 바로 완료)
+            mac = self.arp.resolve(ip_bytes, timeout=2.0).result()
+            if mac:
+                self._update_peer_mac_gui(mac)
                 return
 
-            # 2. 응답 대기 (Polling): 최대 2초간 대기 (0.2초 * 10회)
-            for _ in range(10):
-                time.sleep(0.2)
-                # ARPLayer의 테이블 확인
-                if ip_bytes in self.arp.arp_table:
-                    found_mac = self.arp.arp_table[ip_bytes]
-                    self._update_peer_mac_gui(found_mac)
-                    return
-
-            # 3. 실패 시 메시지
+            # 실패 시 메시지
             self.root.after(0, lambda: self.set_status(f"ARP Failed: No response from {ip_str}"))
 
         except Exception as e:
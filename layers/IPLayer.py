@@ -1,24 +1,57 @@
 from .BaseLayer import BaseLayer
+from .Pacer import Pacer
+from .Reassembly import ReassemblyManager
+from .PathMTU import PathMtuDiscovery
+from .TxScheduler import TxScheduler
+from .ReliableTransport import ReliableTransport, FLAG_MF, FLAG_RELIABLE
 import struct
 import random
-import time
 
 class IPLayer(BaseLayer):
     # 프로토콜 상수
     PROTOCOL_CHAT = 1
     PROTOCOL_FILE = 2
+    PROTOCOL_ACK = 3    # 신뢰 전송 ACK (ReliableTransport)
+    PROTOCOL_PMTU = 4   # 경로 MTU 협상 (PathMtuDiscovery)
 
     IP_BROADCAST = b'\xFF\xFF\xFF\xFF'
+    IP_ANY = b'\x00\x00\x00\x00'
 
+    # 피어 MTU를 모를 때 쓰는 IP 패킷 최대 크기 (링크 MTU가 더 작으면 그 값)
     MTU = 1480
     IP_HEADER_SIZE = 20
 
+    # 한 번의 send_many 호출로 내려보낼 조각 수 (pacer.burst와 작은 쪽 사용)
+    TX_BATCH = 64
+
+    # 기본 송신 속도: 기존 조각당 0.2ms 간격과 같은 초당 5000 조각
+    DEFAULT_RATE_PPS = 5000
+    DEFAULT_BURST = 32
+
     def __init__(self):
         super().__init__()
         self.src_ip = b'\x00\x00\x00\x00'
         self.dst_ip = b'\x00\x00\x00\x00'
+        self.dst_mac = None
         self.upper_protocols = {}
-        self.rx_buffer = {}
+        self.reassembly = ReassemblyManager()
+        self.pacer = Pacer(rate_pps=self.DEFAULT_RATE_PPS, burst=self.DEFAULT_BURST)
+        self.reliable = ReliableTransport(self)
+        self.reliable_protocols = set()
+        self.pmtu = PathMtuDiscovery(self)
+        self.streaming_protocols = set()
+
+        # 송신 스케줄러: 모든 송신은 프로토콜별 큐를 거쳐 송신 스레드 하나가 pacing하며 내보냄
+        # 기본은 엄격한 우선순위 (제어 > 채팅 > 파일), 파일 큐는 짧게 두어 채팅이 오래 기다리지 않게 함
+        self.scheduler = TxScheduler(self._send_batch, lambda: self.pacer)
+        self.scheduler.add_class('control', priority=0, limit=0)
+        self.scheduler.add_class('chat', priority=1, limit=256)
+        self.scheduler.add_class('default', priority=1, limit=64)
+        self.scheduler.add_class('file', priority=2, limit=4)
+        self.scheduler.map_protocol(self.PROTOCOL_ACK, 'control')
+        self.scheduler.map_protocol(self.PROTOCOL_PMTU, 'control')
+        self.scheduler.map_protocol(self.PROTOCOL_CHAT, 'chat')
+        self.scheduler.map_protocol(self.PROTOCOL_FILE, 'file')
 
     def register_upper(self, protocol_id, layer):
         self.upper_protocols[protocol_id] = layer
@@ -33,98 +66,278 @@ class IPLayer(BaseLayer):
             self.dst_ip = ip_bytes
 
     def set_dst_mac(self, mac: bytes):
+        self.dst_mac = bytes(mac)
         if self.lower and hasattr(self.lower, 'set_dst_mac'):
             self.lower.set_dst_mac(mac)
 
-    def send(self, data: bytes, protocol=PROTOCOL_CHAT):
+    def set_pacing(self, rate_bps: float = None, rate_pps: float = None, burst: int = DEFAULT_BURST):
+        """송신 속도 설정 (둘 다 None이면 제한 없음). 인터페이스 속도에 맞춰 조정"""
+        self.pacer = Pacer(rate_pps=rate_pps, rate_bps=rate_bps, burst=burst)
+        print(f"[IP] Pacing set: {rate_pps} pps, {rate_bps} bps, burst {burst}")
+
+    def get_pacing_stats(self):
+        return self.pacer.get_stats()
+
+    def set_reassembly_limits(self, timeout: float = None, max_bytes: int = None,
+                              per_source_max: int = None, per_source_bytes: int = None):
+        """재조립 타임아웃/메모리 한도 조정 (None은 기존 값 유지)"""
+        mgr = self.reassembly
+        if timeout is not None:
+            mgr.timeout = timeout
+        if max_bytes is not None:
+            mgr.max_bytes = max_bytes
+        if per_source_max is not None:
+            mgr.per_source_max = per_source_max
+        if per_source_bytes is not None:
+            mgr.per_source_bytes = per_source_bytes
+
+    def get_link_mtu(self):
+        """하위 링크가 실을 수 있는 IP 패킷 최대 크기"""
+        if self.lower and hasattr(self.lower, 'get_mtu'):
+            mtu = self.lower.get_mtu()
+            if mtu:
+                return mtu
+        return self.MTU
+
+    def get_path_mtu(self, dst_ip, dst_mac=None, size=None):
+        """dst_ip로 보낼 IP 패킷 최대 크기
+
+        기본 크기로 한 조각에 들어가는 데이터거나 브로드캐스트면 협상하지 않고,
+        그 외에는 피어별로 한 번 협상해서 기억한 값을 사용한다.
+        """
+        default = min(self.MTU, self.get_link_mtu())
+        if dst_ip == self.IP_BROADCAST:
+            return default
+        if size is not None and size <= default - self.IP_HEADER_SIZE:
+            mtu = self.pmtu.get(dst_ip)
+            if mtu is None:
+                return default
+        else:
+            mtu = self.pmtu.get_or_discover(dst_ip, dst_mac)
+        # 묶음 전송(coalescing) 프레임도 이 피어의 MTU를 넘지 않도록 하위에 알림
+        if dst_mac is not None and self.lower and hasattr(self.lower, 'set_peer_mtu'):
+            self.lower.set_peer_mtu(dst_mac, mtu)
+        return mtu
+
+    def set_path_mtu(self, dst_ip, mtu):
+        """피어 MTU 수동 지정 (협상 생략)"""
+        self.pmtu.set(dst_ip, mtu)
+
+    def set_reliable(self, protocol, enabled: bool = True):
+        """protocol 데이터그램을 ACK/선택적 재전송으로 보냄 (상대도 이 기능을 지원해야 함)"""
+        if enabled:
+            self.reliable_protocols.add(protocol)
+        else:
+            self.reliable_protocols.discard(protocol)
+
+    def set_tx_policy(self, policy):
+        """TxScheduler.POLICY_PRIORITY(엄격한 우선순위) 또는 POLICY_DRR(가중치 공정 분배)"""
+        self.scheduler.set_policy(policy)
+
+    def set_tx_class(self, protocol, name=None, priority=1, weight=1, limit=64):
+        """protocol의 송신 클래스 지정/변경 (name 생략 시 'proto<번호>')"""
+        name = name or f'proto{protocol}'
+        self.scheduler.add_class(name, priority=priority, weight=weight, limit=limit)
+        self.scheduler.map_protocol(protocol, name)
+
+    def get_tx_stats(self):
+        """클래스별 큐 길이/최대 길이/대기 시간"""
+        return self.scheduler.get_stats()
+
+    def set_streaming(self, protocol, enabled: bool = True):
+        """protocol 상위 계층에 전체 재조립 대신 순서대로 이어지는 데이터를 바로 넘김
+
+        상위 계층은 on_begin(key, src_ip) / on_data(key, offset, chunk) / on_end(key, ok)를
+        구현해야 한다. chunk는 on_data 호출 안에서만 유효한 memoryview일 수 있다.
+        """
+        if enabled:
+            self.streaming_protocols.add(protocol)
+        else:
+            self.streaming_protocols.discard(protocol)
+
+    def get_reliable_stats(self):
+        return self.reliable.get_stats()
+
+    def get_reassembly_stats(self):
+        return self.reassembly.get_stats()
+
+    def get_dst(self):
+        """현재 기본 목적지 (dst_ip, dst_mac) 스냅샷 -> send()에 그대로 넘길 수 있음"""
+        return self.dst_ip, self.dst_mac
+
+    def send(self, data: bytes, protocol=PROTOCOL_CHAT, dst_ip=None, dst_mac=None, on_fail=None):
+        """데이터그램 송신
+
+        dst_ip/dst_mac을 넘기면 이 호출에만 적용되므로, 여러 스레드가 서로 다른
+        피어로 동시에 보내도 전역 목적지 변경에 영향을 받지 않는다.
+        생략하면 호출 시점의 기본 목적지를 한 번 읽어서 모든 조각에 사용한다.
+        MAC을 몰라 ARP 응답을 기다리는 동안에는 True(접수됨)를 반환하고, 이후 실패는
+        on_fail(dst_ip)로 알린다 (생략 시 로그만 남김).
+        """
         if not self.lower:
             return False
 
-        pkt_id = random.randint(0, 65535)
+        if dst_ip is None:
+            dst_ip = self.dst_ip
+        if dst_mac is None:
+            dst_mac = self.dst_mac
+        if dst_mac is None and dst_ip not in (self.IP_BROADCAST, self.IP_ANY) \
+                and hasattr(self.lower, 'resolve'):
+            if protocol in self.reliable_protocols:
+                # 신뢰 전송은 완료까지 블록하는 호출이므로 MAC도 기다림
+                dst_mac = self.lower.resolve(dst_ip).result()
+                if dst_mac is None:
+                    return False
+            else:
+                # MAC을 알 때까지 ARP 계층에 맡겨 두고 응답이 오면 이어서 송신
+                fut = self.lower.send_when_resolved(
+                    dst_ip, lambda mac: self.send(data, protocol, dst_ip, mac))
+                if fut.done():
+                    return fut.result()
+
+                def report(f):
+                    if not f.result():
+                        ip_str = '.'.join(str(b) for b in dst_ip)
+                        print(f"[IP] Send Failed: no ARP reply from {ip_str}")
+                        if on_fail:
+                            on_fail(dst_ip)
+                fut.add_done_callback(report)
+                return True
+
+        # 목적지별로 협상한 MTU로 조각 크기 결정 (점보 프레임이면 조각 수가 크게 줄어듦)
+        max_payload_size = self.get_path_mtu(dst_ip, dst_mac, len(data)) - self.IP_HEADER_SIZE
+        if protocol in self.reliable_protocols and dst_ip != self.IP_BROADCAST:
+            return self.reliable.send(data, protocol, dst_ip, dst_mac, max_payload_size)
+
+        pkt_id = self.new_pkt_id()
         total_size = len(data)
         offset = 0
-        max_payload_size = self.MTU - self.IP_HEADER_SIZE
 
         print(f"[IP] Start Sending. Size: {total_size}, ID: {pkt_id}, Protocol: {protocol}")
 
+        batch_size = min(self.TX_BATCH, self.pacer.burst)
+        unit = None
+        batch = []
         while offset < total_size:
             chunk_size = min(max_payload_size, total_size - offset)
             chunk = data[offset : offset + chunk_size]
-            mf = 1 if (offset + chunk_size) < total_size else 0
-
-            header = struct.pack('!4s4sBHIIB',
-                                 self.src_ip,
-                                 self.dst_ip,
-                                 protocol,
-                                 pkt_id,
-                                 offset,
-                                 len(chunk),
-                                 mf)
-
-            self.lower.send(header + chunk)
+            mf = FLAG_MF if (offset + chunk_size) < total_size else 0
+
+            batch.append(self.build_packet(dst_ip, protocol, pkt_id, offset, chunk, mf))
             offset += chunk_size
-            time.sleep(0.0002)
 
+            if len(batch) >= batch_size or offset >= total_size:
+                # burst 단위로 스케줄러 큐에 넣음 (pacing은 송신 스레드에서)
+                unit = self.scheduler.submit(protocol, batch, dst_mac)
+                batch = []
+
+        if unit is not None:
+            unit.done.wait()
         print(f"[IP] Finish Sending ID: {pkt_id}")
         return True
 
-    def recv(self, data: bytes):
+    def new_pkt_id(self):
+        return random.randint(0, 65535)
+
+    def build_packet(self, dst_ip, protocol, pkt_id, offset, chunk, flags):
+        header = struct.pack('!4s4sBHIIB',
+                             self.src_ip,
+                             dst_ip,
+                             protocol,
+                             pkt_id,
+                             offset,
+                             len(chunk),
+                             flags)
+        return header + chunk
+
+    def _send_batch(self, packets, dst_mac=None):
+        if len(packets) > 1 and hasattr(self.lower, 'send_many'):
+            return self.lower.send_many(packets, dst_mac=dst_mac)
+        ok = True
+        for pkt in packets:
+            ok = self.lower.send(pkt, dst_mac=dst_mac) and ok
+        return ok
+
+    def recv(self, data: bytes, ether_type: bytes = None, src_mac: bytes = None):
+        """src_mac은 이 패킷을 실어 온 프레임의 출발지 MAC (ACK/PMTU 응답을 보낼 곳)"""
         if len(data) < 20:
             return False
 
-        header = data[:20]
         try:
             # 헤더 언패킹: 여기서 length 변수를 가져옵니다.
-            src_ip, dst_ip, proto, pkt_id, offset, length, mf = struct.unpack('!4s4sBHIIB', header)
+            src_ip, dst_ip, proto, pkt_id, offset, length, flags = struct.unpack_from('!4s4sBHIIB', data, 0)
         except:
             return False
 
         # [수정 핵심] data[20:]으로 끝까지 다 읽는 게 아니라,
         # 헤더에 명시된 length만큼만 읽어야 뒤에 붙은 이더넷 패딩을 제외할 수 있음
-        payload = data[20 : 20 + length]
+        # (memoryview 슬라이스이므로 복사 없음)
+        mv = data if isinstance(data, memoryview) else memoryview(data)
+        payload = mv[20 : 20 + length]
 
         # --- 아래는 기존 로직과 동일 ---
         if dst_ip != self.src_ip and dst_ip != self.IP_BROADCAST:
             return False
 
-        key = (src_ip, pkt_id)
+        if proto == self.PROTOCOL_ACK:
+            return self.reliable.on_ack(src_ip, payload)
+        if proto == self.PROTOCOL_PMTU:
+            return self.pmtu.on_message(src_ip, src_mac, payload, self.IP_HEADER_SIZE + length)
 
-        if key not in self.rx_buffer:
-            self.rx_buffer[key] = {
-                'fragments': [],
-                'received_len': 0,
-                'total_len': None,
-                'last_ts': time.time()
-            }
+        mf = flags & FLAG_MF
+        reliable = flags & FLAG_RELIABLE
+        key = (src_ip, pkt_id)
 
-        entry = self.rx_buffer[key]
+        if reliable and self.reliable.is_done(key):
+            # 이미 받은 데이터그램의 재전송 -> 다시 올리지 않고 ACK만 보냄
+            self.reliable.on_done_duplicate(key, src_ip, src_mac)
+            return True
 
-        for frag in entry['fragments']:
-            if frag[0] == offset:
+        # 조각 하나짜리 데이터그램은 버퍼링 없이 그대로 상위 전달 (복사 없음)
+        if offset == 0 and mf == 0 and key not in self.reassembly:
+            if reliable:
+                self.reliable.on_single(key, src_ip, src_mac)
+            upper = self.upper_protocols.get(proto)
+            if upper is None:
                 return True
+            if proto in self.streaming_protocols:
+                upper.on_begin(key, src_ip)
+                upper.on_data(key, 0, payload)
+                upper.on_end(key, True)
+                return True
+            return upper.recv(payload)
 
-        # 이제 payload 길이가 정확하므로 received_len 계산이 정확해짐
-        entry['fragments'].append((offset, payload))
-        entry['received_len'] += len(payload)
+        # 바이트맵으로 O(1) 중복 검사 후 버퍼의 offset 위치에 바로 기록 (수신 경로에서 유일한 복사)
+        # 하위 버퍼(mmap 링 등)를 붙잡지 않으므로 프레임 재사용에도 안전함
+        # 메모리 예산/출발지별 제한을 넘으면 관리자가 거절하거나 오래된 것을 정리함
+        # 스트리밍 프로토콜은 이어지는 구간이 생길 때마다 상위 on_data로 바로 전달됨
+        sink = self.upper_protocols.get(proto) if proto in self.streaming_protocols else None
+        entry, added = self.reassembly.add(key, src_ip, pkt_id, proto, offset, payload, mf, sink)
+        if entry is None:
+            return False
+        if reliable:
+            # 받은 조각은 ACK/SACK로 알림 (중복이면 즉시 ACK)
+            self.reliable.on_fragment(key, entry, offset, added, src_ip, src_mac)
+        if not added:
+            return True
 
         if mf == 0:
-            entry['total_len'] = offset + len(payload)
-            print(f"[IP] Last Fragment ID:{pkt_id}. Total: {entry['total_len']}")
+            print(f"[IP] Last Fragment ID:{pkt_id}. Total: {entry.total_len}")
 
         # [디버깅] 진행 상황 출력 (10번째 패킷마다)
-        if len(entry['fragments']) % 10 == 0:
-            total_str = str(entry['total_len']) if entry['total_len'] else "???"
-            print(f"[IP] Reassembling ID:{pkt_id}.. Current: {entry['received_len']} / Total: {total_str}")
+        if entry.count % 10 == 0:
+            total_str = str(entry.total_len) if entry.total_len else "???"
+            print(f"[IP] Reassembling ID:{pkt_id}.. Current: {entry.received} / Total: {total_str}")
 
         # 재조립 완료 조건 검사
-        if entry['total_len'] is not None and entry['received_len'] == entry['total_len']:
+        if entry.complete:
             print(f"[IP] Reassembly Complete! ID:{pkt_id}")
+            if entry.streaming:
+                return True
 
-            entry['fragments'].sort(key=lambda x: x[0])
-            reassembled_data = b''.join(f[1] for f in entry['fragments'])
-            del self.rx_buffer[key]
+            reassembled_data = entry.data()
 
             if proto in self.upper_protocols:
                 return self.upper_protocols[proto].recv(reassembled_data)
 
-        return True
\ No newline at end of file
+        return True
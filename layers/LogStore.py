@@ -0,0 +1,449 @@
+import json
+import os
+import threading
+
+INDEX_NAME = 'index.json'
+INDEX_VERSION = 1
+# 예전 형식에서 옮긴 레코드는 항상 이 세그먼트에 둠 (파일이 있으면 이전이 끝난 것)
+MIGRATED_SEGMENT = 'seg_000000.jsonl'
+
+# 삭제 표시 레코드: {"op": "del", "id": <지운 메시지 id>}
+TOMBSTONE_KEY = 'op'
+TOMBSTONE_DEL = 'del'
+
+
+class LogStore:
+    """대화 상대 한 명의 채팅 로그 (JSON Lines 세그먼트 + 작은 색인)
+
+    레코드 하나를 한 줄로 현재 세그먼트 끝에 덧붙이므로 추가 비용은 로그 길이와 무관하다.
+    세그먼트가 segment_bytes를 넘으면 새 파일로 넘어가고, index.json에는 세그먼트별
+    레코드 수와 크기만 기록한다. 기록을 불러올 때는 뒤쪽 세그먼트부터 필요한 만큼만 읽는다.
+    예전 형식(<이름>.json 하나에 전체 배열)이 있으면 처음 열 때 한 번 옮긴다.
+
+    삭제는 파일을 다시 쓰지 않고 삭제 표시(tombstone)를 덧붙인다. id -> 위치 색인은
+    열 때 백그라운드에서 만들고(닫힌 세그먼트는 잠금 없이 읽음), 지워진 레코드와 삭제 표시가
+    전체의 COMPACT_RATIO를 넘으면 백그라운드에서 닫힌 세그먼트를 압축한다.
+    id가 해시할 수 없는 값(list 등)인 레코드는 색인/삭제 대상에서 뺀다.
+    """
+    SEGMENT_BYTES = 4 << 20
+    COMPACT_RATIO = 0.25
+    COMPACT_MIN = 64
+
+    def __init__(self, path, legacy_path=None, segment_bytes=SEGMENT_BYTES):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.segments = []   # [{'name', 'records', 'bytes'}] 오래된 것부터
+        self._lock = threading.RLock()
+        self._fp = None
+        self._ids = None          # id -> (세그먼트 이름, 오프셋), _build_index/_ensure_index에서 생성
+        self._compacting = False
+        self.stats = {'ignored_deletes': 0, 'compactions': 0}
+        os.makedirs(path, exist_ok=True)
+        self._load_index()
+        if legacy_path and os.path.exists(legacy_path):
+            self._migrate(legacy_path)
+        if self.segments:
+            threading.Thread(target=self._build_index, daemon=True).start()
+
+    # ==== 색인 ================================================================
+    def _index_path(self):
+        return os.path.join(self.path, INDEX_NAME)
+
+    def _seg_path(self, name):
+        return os.path.join(self.path, name)
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION:
+                self.segments = [s for s in index.get('segments', [])
+                                 if os.path.exists(self._seg_path(s['name']))]
+        except (OSError, ValueError):
+            self.segments = []
+        if not self.segments:
+            # 색인이 없거나 깨졌으면 세그먼트 파일로 다시 만듦
+            names = sorted(n for n in os.listdir(self.path) if n.startswith('seg_') and n.endswith('.jsonl'))
+            self.segments = [{'name': n, 'records': 0, 'bytes': 0, 'dead': 0, 'tombstones': 0}
+                             for n in names]
+            for seg in self.segments:
+                self._rescan(seg)
+        else:
+            # 색인은 세그먼트를 바꿀 때만 저장하므로 마지막 세그먼트는 실제 파일로 맞춤
+            self._rescan(self.segments[-1])
+
+    def _rescan(self, seg):
+        """세그먼트의 레코드 수/크기를 파일에서 다시 셈 (비정상 종료로 잘린 마지막 줄은 버림)"""
+        fpath = self._seg_path(seg['name'])
+        with open(fpath, 'rb') as f:
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            with open(fpath, 'r+b') as f:
+                f.truncate(end)
+        seg['records'] = data.count(b'\n', 0, end)
+        seg['bytes'] = end
+
+    def _fsync_dir(self):
+        """파일 이름 변경을 디스크에 기록 (디렉터리 fsync를 지원하지 않는 OS는 건너뜀)"""
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _save_index(self):
+        tmp = self._index_path() + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'segments': self.segments}, f)
+        os.replace(tmp, self._index_path())
+
+    def _migrate(self, legacy_path):
+        """예전 로그를 임시 파일에 쓴 뒤 MIGRATED_SEGMENT로 바꿔 넣음
+
+        세그먼트 이름 자체가 완료 표시이므로, 도중에 종료돼도 다음에 열 때
+        다시 옮기지 않고(중복 없음) 남은 단계(색인 저장, 예전 파일 이름 변경)만 마친다.
+        """
+        seg_path = self._seg_path(MIGRATED_SEGMENT)
+        count = None
+        if not os.path.exists(seg_path):
+            try:
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    content = f.read().strip()
+                records = json.loads(content) if content else []
+            except (OSError, ValueError) as e:
+                print(f'[Log] Legacy log read error ({legacy_path}): {e}')
+                return
+            if not records:
+                os.replace(legacy_path, legacy_path + '.migrated')
+                return
+            tmp = seg_path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(b''.join(self._encode(r) for r in records))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, seg_path)
+            self._fsync_dir()
+            count = len(records)
+        with self._lock:
+            if not any(s['name'] == MIGRATED_SEGMENT for s in self.segments):
+                # 예전 로그가 더 오래됐으므로 맨 앞에 둠
+                seg = {'name': MIGRATED_SEGMENT, 'records': 0, 'bytes': 0, 'dead': 0, 'tombstones': 0}
+                self._rescan(seg)
+                self.segments.insert(0, seg)
+                self._ids = None
+            self._save_index()
+        os.replace(legacy_path, legacy_path + '.migrated')
+        if count is not None:
+            print(f'[Log] Migrated {count} records from {os.path.basename(legacy_path)}')
+
+    # ==== 쓰기 ================================================================
+    def _active(self):
+        if not self.segments or self.segments[-1]['bytes'] >= self.segment_bytes:
+            self._rotate()
+        if self._fp is None:
+            self._fp = open(self._seg_path(self.segments[-1]['name']), 'ab')
+        return self._fp
+
+    def _rotate(self):
+        if self._fp:
+            self._fp.close()
+            self._fp = None
+        num = int(self.segments[-1]['name'][4:-6]) + 1 if self.segments else 1
+        self.segments.append({'name': f'seg_{num:06d}.jsonl', 'records': 0, 'bytes': 0,
+                              'dead': 0, 'tombstones': 0})
+        self._save_index()
+
+    @staticmethod
+    def _encode(record):
+        return (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+    @staticmethod
+    def tombstone(msg_id):
+        """msg_id 삭제 표시 레코드 (append로 기록)"""
+        return {TOMBSTONE_KEY: TOMBSTONE_DEL, 'id': msg_id}
+
+    @staticmethod
+    def _is_tombstone(record):
+        return record.get(TOMBSTONE_KEY) == TOMBSTONE_DEL
+
+    @staticmethod
+    def _id_of(record):
+        """색인에 쓸 id (없거나 해시할 수 없으면 None)"""
+        msg_id = record.get('id')
+        try:
+            hash(msg_id)
+        except TypeError:
+            return None
+        return msg_id
+
+    def append(self, record: dict):
+        self.append_many([record])
+
+    def append_many(self, records):
+        """레코드 추가. 삭제 표시는 아는 id일 때만 기록 (모르는 id는 디스크에 쓰지 않음)
+
+        먼저 모두 인코딩하므로 직렬화할 수 없는 레코드가 있으면 아무것도 쓰지 않고 예외를 낸다.
+        """
+        if not records:
+            return
+        lines = [self._encode(record) for record in records]
+        compact = False
+        with self._lock:
+            for record, line in zip(records, lines):
+                tomb = self._is_tombstone(record)
+                if tomb:
+                    self._ensure_index()
+                    loc = self._ids.pop(self._id_of(record), None)
+                    if loc is None:
+                        self.stats['ignored_deletes'] += 1
+                        continue
+                    dead_seg = self._seg(loc[0])
+                    dead_seg['dead'] = dead_seg.get('dead', 0) + 1
+                fp = self._active()
+                seg = self.segments[-1]
+                if tomb:
+                    seg['tombstones'] = seg.get('tombstones', 0) + 1
+                elif self._ids is not None and self._id_of(record) is not None:
+                    self._ids[record['id']] = (seg['name'], seg['bytes'])
+                fp.write(line)
+                seg['records'] += 1
+                seg['bytes'] += len(line)
+                compact = compact or tomb
+            if self._fp:
+                self._fp.flush()
+        if compact:
+            self._maybe_compact()
+
+    def delete(self, msg_id):
+        """삭제 표시를 덧붙임 (파일을 다시 쓰지 않음). 아는 id였으면 True"""
+        if self._id_of({'id': msg_id}) is None:
+            return False
+        with self._lock:
+            self._ensure_index()
+            known = msg_id in self._ids
+        if known:
+            self.append(self.tombstone(msg_id))
+        return known
+
+    def flush(self):
+        with self._lock:
+            if self._fp:
+                self._fp.flush()
+
+    def sync(self):
+        """현재 세그먼트를 디스크까지 기록 (fsync)"""
+        with self._lock:
+            if self._fp:
+                self._fp.flush()
+                os.fsync(self._fp.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._fp:
+                self._fp.close()
+                self._fp = None
+            if self.segments:
+                self._save_index()
+
+    # ==== id 색인 (열 때 백그라운드에서 만듦) =====================================
+    def _seg(self, name):
+        for seg in reversed(self.segments):
+            if seg['name'] == name:
+                return seg
+        raise KeyError(name)
+
+    def _scan_index(self, segments, ids, counts):
+        """segments를 순서대로 읽어 ids와 counts(세그먼트 이름 -> [삭제된 수, 삭제 표시 수])를 채움"""
+        for seg in segments:
+            seg_counts = counts.setdefault(seg['name'], [0, 0])
+            for off, record in self._iter_segment(seg):
+                msg_id = self._id_of(record)
+                if self._is_tombstone(record):
+                    seg_counts[1] += 1
+                    loc = ids.pop(msg_id, None)
+                    if loc is not None:
+                        counts[loc[0]][0] += 1
+                elif msg_id is not None:
+                    ids[msg_id] = (seg['name'], off)
+
+    def _build_index(self):
+        """열 때 백그라운드에서 색인 생성. 닫힌 세그먼트는 잠금 없이 읽고 현재 세그먼트만 잠그고 읽음
+
+        닫힌 세그먼트는 압축 때만 바뀌는데 압축은 색인이 있어야 시작하므로 읽는 동안 바뀌지 않는다.
+        """
+        with self._lock:
+            if self._ids is not None:
+                return
+            closed = [dict(s) for s in self.segments[:-1]]
+        ids, counts = {}, {}
+        try:
+            self._scan_index(closed, ids, counts)
+        except OSError as e:
+            print(f'[Log] Index build error ({self.path}): {e}')
+            return
+        with self._lock:
+            if self._ids is None and [s['name'] for s in self.segments[:len(closed)]] == \
+                    [s['name'] for s in closed]:
+                self._ensure_index((ids, counts, len(closed)))
+
+    def _ensure_index(self, partial=None):
+        """(self._lock 안에서) id -> (세그먼트, 오프셋) 색인과 세그먼트별 삭제 수 계산
+
+        partial은 앞쪽 세그먼트를 미리 읽은 결과 (ids, counts, 세그먼트 수)
+        """
+        if self._ids is not None:
+            return
+        if self._fp:
+            self._fp.flush()
+        ids, counts, done = partial or ({}, {}, 0)
+        self._scan_index(self.segments[done:], ids, counts)
+        for seg in self.segments:
+            seg['dead'], seg['tombstones'] = counts.get(seg['name'], (0, 0))
+        self._ids = ids
+
+    def get(self, msg_id):
+        """id로 레코드 하나 조회 (지워졌거나 없으면 None)"""
+        if self._id_of({'id': msg_id}) is None:
+            return None
+        with self._lock:
+            self._ensure_index()
+            loc = self._ids.get(msg_id)
+            if loc is None:
+                return None
+            if self._fp:
+                self._fp.flush()
+            with open(self._seg_path(loc[0]), 'rb') as f:
+                f.seek(loc[1])
+                return json.loads(f.readline())
+
+    # ==== 압축 (삭제된 레코드와 삭제 표시 제거) ==================================
+    def garbage_ratio(self):
+        total = sum(s['records'] for s in self.segments)
+        garbage = sum(s.get('dead', 0) + s.get('tombstones', 0) for s in self.segments)
+        return garbage / total if total else 0.0
+
+    def _maybe_compact(self):
+        with self._lock:
+            garbage = sum(s.get('dead', 0) + s.get('tombstones', 0) for s in self.segments[:-1])
+            if self._compacting or garbage < self.COMPACT_MIN or self.garbage_ratio() < self.COMPACT_RATIO:
+                return
+            self._compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """닫힌 세그먼트를 하나씩 다시 씀 (현재 세그먼트는 그대로).
+
+        삭제 표시는 항상 대상 레코드보다 뒤에 기록되므로, 닫힌 세그먼트 안의 삭제 표시가
+        가리키는 레코드도 닫힌 세그먼트에 있어 함께 지워진다. 세그먼트 하나를 쓰는 동안만
+        잠그므로 쓰기 스레드는 세그먼트 하나(최대 segment_bytes) 처리 시간 이상 기다리지 않는다.
+        """
+        removed = 0
+        try:
+            with self._lock:
+                self._ensure_index()
+                names = [s['name'] for s in self.segments[:-1]
+                         if s.get('dead', 0) or s.get('tombstones', 0)]
+            for name in names:
+                with self._lock:
+                    removed += self._compact_segment(self._seg(name))
+            with self._lock:
+                self._save_index()
+        finally:
+            with self._lock:
+                self._compacting = False
+        if removed:
+            self.stats['compactions'] += 1
+            print(f'[Log] Compacted {os.path.basename(self.path)}: removed {removed} records')
+        return removed
+
+    def _compact_segment(self, seg):
+        name = seg['name']
+        ids = self._ids
+        out = []
+        size = 0
+        kept = 0
+        for off, record in self._iter_segment(seg):
+            if self._is_tombstone(record):
+                continue
+            msg_id = self._id_of(record)
+            if msg_id is not None and ids.get(msg_id) != (name, off):
+                continue
+            line = self._encode(record)
+            if msg_id is not None:
+                ids[msg_id] = (name, size)
+            out.append(line)
+            size += len(line)
+            kept += 1
+        removed = seg['records'] - kept
+
+        fpath = self._seg_path(name)
+        if not out:
+            self.segments.remove(seg)
+            os.remove(fpath)
+            return removed
+        # 바꾸기 전에 새 내용을, 바꾼 뒤에 디렉터리를 디스크에 기록 (중간에 종료돼도 세그먼트가 잘리지 않음)
+        with open(fpath + '.tmp', 'wb') as f:
+            f.write(b''.join(out))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(fpath + '.tmp', fpath)
+        self._fsync_dir()
+        seg.update(records=kept, bytes=size, dead=0, tombstones=0)
+        return removed
+
+    # ==== 읽기 ================================================================
+    def _iter_segment(self, seg):
+        """(오프셋, 레코드) 순서대로"""
+        with open(self._seg_path(seg['name']), 'rb') as f:
+            data = f.read(seg['bytes'])
+        off = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                yield off, json.loads(line)
+            except ValueError:
+                pass
+            off += len(line)
+
+    def tail(self, limit=None):
+        """지워지지 않은 마지막 limit개 레코드 (None이면 전체). 필요한 세그먼트만 읽음"""
+        chunks = []
+        count = 0
+        deleted = set()
+        with self._lock:
+            if self._fp:
+                self._fp.flush()
+            # 삭제 표시는 대상보다 뒤에 있으므로 뒤에서부터 읽으며 모음
+            for seg in reversed(self.segments):
+                if limit is not None and count >= limit:
+                    break
+                live = []
+                for _, record in reversed(list(self._iter_segment(seg))):
+                    msg_id = self._id_of(record)
+                    if self._is_tombstone(record):
+                        deleted.add(msg_id)
+                    elif msg_id is None or msg_id not in deleted:
+                        live.append(record)
+                live.reverse()
+                chunks.append(live)
+                count += len(live)
+        records = [r for chunk in reversed(chunks) for r in chunk]
+        if limit is not None:
+            records = records[-limit:] if limit else []
+        return records
+
+    def get_stats(self):
+        with self._lock:
+            st = dict(self.stats)
+            st['segments'] = len(self.segments)
+            st['records'] = len(self)
+            st['garbage_ratio'] = round(self.garbage_ratio(), 3)
+        return st
+
+    def __len__(self):
+        return sum(s['records'] for s in self.segments)
@@ -0,0 +1,194 @@
+import atexit
+import threading
+import time
+from collections import deque
+
+
+class LogWriter:
+    """채팅 로그 쓰기 전용 스레드 (ChatAppLayer 보조 클래스)
+
+    submit은 레코드를 메모리 큐에 넣고 바로 반환하므로 수신 스레드가 디스크를 기다리지 않는다.
+    쓰기 스레드는 첫 레코드가 들어온 뒤 flush_interval만큼(또는 max_batch개가 찰 때까지)
+    모았다가 저장소별로 한 번에 덧붙인다 (group commit).
+    fsync 정책: FSYNC_NEVER(OS에 맡김), FSYNC_BATCH(묶음마다), FSYNC_INTERVAL(fsync_interval초마다)
+    종료 시 close()(또는 atexit)에서 남은 레코드를 모두 쓴다.
+    """
+    FSYNC_NEVER = 'never'
+    FSYNC_BATCH = 'batch'
+    FSYNC_INTERVAL = 'interval'
+
+    def __init__(self, flush_interval=0.05, max_batch=512,
+                 fsync=FSYNC_INTERVAL, fsync_interval=1.0):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._queue = deque()   # (store, record, 넣은 시각)
+        self._cv = threading.Condition()
+        self._busy = False      # 쓰기 스레드가 꺼낸 묶음을 처리 중
+        self._closed = False
+        self._dirty = set()     # 아직 fsync하지 않은 저장소
+        self._last_sync = time.monotonic()
+        self._thread = None
+        self.stats = {'submitted': 0, 'written': 0, 'batches': 0, 'errors': 0,
+                      'max_depth': 0, 'lag_total': 0.0, 'lag_max': 0.0, 'fsyncs': 0}
+        atexit.register(self.close)
+
+    def submit(self, store, record):
+        with self._cv:
+            if self._closed:
+                # 종료 후 들어온 레코드는 바로 씀
+                store.append(record)
+                return
+            self._queue.append((store, record, time.monotonic()))
+            st = self.stats
+            st['submitted'] += 1
+            st['max_depth'] = max(st['max_depth'], len(self._queue))
+            self._cv.notify_all()
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._cv:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, daemon=True)
+                    self._thread.start()
+
+    # ==== 쓰기 스레드 ==========================================================
+    def _loop(self):
+        while True:
+            batch = None
+            with self._cv:
+                if not self._queue and not self._closed:
+                    self._cv.wait(self._sync_wait())
+                if self._queue:
+                    # 첫 레코드가 들어온 뒤 flush_interval 동안 더 모음
+                    deadline = self._queue[0][2] + self.flush_interval
+                    while len(self._queue) < self.max_batch and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cv.wait(remaining)
+                    batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch))]
+                    self._busy = True
+                elif self._closed:
+                    return
+
+            if batch is None:
+                # 한동안 새 레코드가 없으면 밀린 fsync만 처리
+                self._maybe_sync()
+                continue
+
+            self._commit(batch)
+
+            with self._cv:
+                self._busy = False
+                self._cv.notify_all()
+
+    def _commit(self, batch):
+        groups = {}
+        for store, record, _ in batch:
+            groups.setdefault(store, []).append(record)
+        errors = 0
+        for store, records in groups.items():
+            try:
+                store.append_many(records)
+                self._dirty.add(store)
+            except Exception as e:
+                print(f'[Log] Write Error: {e} -> 하나씩 다시 기록')
+                errors += self._commit_each(store, records)
+        if self.fsync == self.FSYNC_BATCH:
+            self._sync_all()
+        else:
+            self._maybe_sync()
+
+        now = time.monotonic()
+        with self._cv:
+            st = self.stats
+            st['written'] += len(batch) - errors
+            st['errors'] += errors
+            st['batches'] += 1
+            for _, _, ts in batch:
+                st['lag_total'] += now - ts
+                st['lag_max'] = max(st['lag_max'], now - ts)
+
+    def _commit_each(self, store, records):
+        """묶음 기록이 실패하면 레코드 하나씩 기록 (문제 있는 레코드만 버림). 실패 수 반환
+
+        append_many는 모든 레코드를 인코딩한 뒤에 쓰므로 잘못된 레코드 때문에 실패하면
+        아무것도 기록되지 않은 상태다 (다시 써도 중복되지 않음).
+        """
+        errors = 0
+        for record in records:
+            try:
+                store.append(record)
+                self._dirty.add(store)
+            except Exception as e:
+                errors += 1
+                print(f'[Log] Write Error: {e} (record dropped)')
+        return errors
+
+    def _sync_wait(self):
+        if self.fsync == self.FSYNC_INTERVAL and self._dirty:
+            return max(0.0, self._last_sync + self.fsync_interval - time.monotonic())
+        return None
+
+    def _maybe_sync(self):
+        if self.fsync == self.FSYNC_INTERVAL and time.monotonic() - self._last_sync >= self.fsync_interval:
+            self._sync_all()
+
+    def _sync_all(self):
+        dirty, self._dirty = self._dirty, set()
+        for store in dirty:
+            try:
+                store.sync()
+                self.stats['fsyncs'] += 1
+            except OSError as e:
+                print(f'[Log] fsync Error: {e}')
+        self._last_sync = time.monotonic()
+
+    # ==== 동기화 ================================================================
+    def flush(self, timeout=None):
+        """지금까지 넣은 레코드가 모두 기록될 때까지 대기"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cv:
+            self._cv.notify_all()
+            while self._queue or self._busy:
+                if self._thread is None or not self._thread.is_alive():
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cv.wait(remaining)
+        return True
+
+    def close(self):
+        """남은 레코드를 모두 쓰고 fsync한 뒤 쓰기 스레드 종료"""
+        with self._cv:
+            if self._closed:
+                return
+            self._closed = True
+            self._cv.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        # 스레드 없이 남은 레코드 (스레드 시작 전 종료 등)
+        with self._cv:
+            batch = list(self._queue)
+            self._queue.clear()
+        if batch:
+            self._commit(batch)
+        if self.fsync != self.FSYNC_NEVER:
+            self._sync_all()
+
+    def get_stats(self):
+        """큐 길이와 기록 지연 (ms)"""
+        with self._cv:
+            st = dict(self.stats)
+            st['depth'] = len(self._queue)
+            oldest = self._queue[0][2] if self._queue else None
+        n = st['written'] + st['errors']
+        lag_total = st.pop('lag_total')
+        st['lag_avg_ms'] = round(lag_total / n * 1000, 3) if n else 0.0
+        st['lag_max_ms'] = round(st.pop('lag_max') * 1000, 3)
+        st['oldest_pending_ms'] = round((time.monotonic() - oldest) * 1000, 3) if oldest else 0.0
+        return st
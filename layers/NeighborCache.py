@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import OrderedDict
+
+STATE_INCOMPLETE = 'incomplete'   # 요청을 보냈고 응답 대기 중 (MAC 없음)
+STATE_REACHABLE = 'reachable'     # 최근 reachable_time 안에 응답/갱신됨
+STATE_STALE = 'stale'             # 오래됐지만 사용은 가능 (사용 시 재확인 요청)
+
+
+class _Neighbor:
+    __slots__ = ('mac', 'state', 'updated', 'requested', 'tries')
+
+    def __init__(self, mac, state, now):
+        self.mac = mac
+        self.state = state
+        self.updated = now
+        self.requested = 0.0
+        self.tries = 0
+
+
+class NeighborCache:
+    """ARP 캐시 (IP bytes -> MAC bytes, ARPLayer 보조 클래스)
+
+    - REACHABLE 항목은 reachable_time이 지나면 STALE이 되고, STALE 항목을 쓰면
+      MAC은 그대로 돌려주되 재확인 요청이 필요하다고 알린다.
+    - STALE로 stale_time이 더 지나면 삭제, 응답이 없는 INCOMPLETE는 incomplete_time 뒤 삭제.
+    - 같은 IP로의 요청은 retry_interval에 한 번만 보낸다.
+    - max_entries를 넘으면 가장 오래 쓰지 않은 항목부터 버린다 (LRU).
+    dict처럼 쓰면(in, [], get, items) MAC을 아는 항목만 보이므로 기존 arp_table 코드와 호환된다.
+    """
+    def __init__(self, reachable_time=30.0, stale_time=600.0, incomplete_time=3.0,
+                 retry_interval=1.0, max_entries=1024):
+        self.reachable_time = reachable_time
+        self.stale_time = stale_time
+        self.incomplete_time = incomplete_time
+        self.retry_interval = retry_interval
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale_hits': 0, 'requests': 0,
+                      'learned': 0, 'expired': 0, 'evicted': 0}
+
+    def configure(self, **params):
+        for name, value in params.items():
+            if not hasattr(self, name) or name.startswith('_') or name == 'stats':
+                raise ValueError(f'unknown neighbor cache parameter: {name}')
+            setattr(self, name, value)
+        with self._lock:
+            self._evict()
+
+    # ==== 송신 경로 ============================================================
+    def lookup(self, ip, now=None):
+        """(mac 또는 None, 지금 ARP Request를 보내야 하는지)"""
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            ent = self._entries.get(ip)
+            if ent is not None and self._expired(ent, now):
+                del self._entries[ip]
+                self.stats['expired'] += 1
+                ent = None
+
+            if ent is None:
+                self.stats['misses'] += 1
+                ent = self._entries[ip] = _Neighbor(None, STATE_INCOMPLETE, now)
+                self._evict()
+                return None, self._want_request(ent, now)
+
+            self._entries.move_to_end(ip)
+            if ent.state == STATE_INCOMPLETE:
+                return None, self._want_request(ent, now)
+
+            if ent.state == STATE_REACHABLE and now - ent.updated >= self.reachable_time:
+                ent.state = STATE_STALE
+            if ent.state == STATE_STALE:
+                # 바로 사용하고 뒤에서 재확인
+                self.stats['stale_hits'] += 1
+                return ent.mac, self._want_request(ent, now)
+
+            self.stats['hits'] += 1
+            return ent.mac, False
+
+    def _want_request(self, ent, now):
+        if now - ent.requested < self.retry_interval:
+            return False
+        ent.requested = now
+        ent.tries += 1
+        self.stats['requests'] += 1
+        return True
+
+    def _expired(self, ent, now):
+        age = now - ent.updated
+        if ent.state == STATE_INCOMPLETE:
+            return age >= self.incomplete_time
+        return age >= self.reachable_time + self.stale_time
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evicted'] += 1
+
+    # ==== 수신 경로 ============================================================
+    def learn(self, ip, mac, create=True, state=STATE_REACHABLE, now=None):
+        """응답으로 알게 된 MAC 기록. create=False면 이미 있는 항목만 갱신"""
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            ent = self._entries.get(ip)
+            if ent is None:
+                if not create:
+                    return False
+                ent = self._entries[ip] = _Neighbor(mac, state, now)
+            else:
+                ent.mac = mac
+                ent.state = state
+                ent.updated = now
+                ent.tries = 0
+                self._entries.move_to_end(ip)
+            self.stats['learned'] += 1
+            self._evict()
+            return True
+
+    def expire(self, now=None):
+        """만료된 항목 정리. 삭제한 개수 반환"""
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            dead = [ip for ip, ent in self._entries.items() if self._expired(ent, now)]
+            for ip in dead:
+                del self._entries[ip]
+            self.stats['expired'] += len(dead)
+            return len(dead)
+
+    def entries(self, now=None):
+        """[(ip, mac, state, age초)] - GUI 표시용 (INCOMPLETE 포함)"""
+        now = now if now is not None else time.monotonic()
+        self.expire(now)
+        out = []
+        with self._lock:
+            for ip, ent in self._entries.items():
+                state = ent.state
+                if state == STATE_REACHABLE and now - ent.updated >= self.reachable_time:
+                    state = STATE_STALE
+                out.append((ip, ent.mac, state, now - ent.updated))
+        return out
+
+    def get_stats(self):
+        with self._lock:
+            st = dict(self.stats)
+            st['entries'] = len(self._entries)
+        return st
+
+    # ==== dict 호환 (MAC을 아는 항목만) =========================================
+    def get(self, ip, default=None):
+        """MAC 반환 (lookup과 같은 만료 기준, 재확인 요청은 하지 않음)"""
+        with self._lock:
+            ent = self._entries.get(ip)
+            if ent is None or ent.mac is None or self._expired(ent, time.monotonic()):
+                return default
+            return ent.mac
+
+    def __contains__(self, ip):
+        return self.get(ip) is not None
+
+    def __getitem__(self, ip):
+        mac = self.get(ip)
+        if mac is None:
+            raise KeyError(ip)
+        return mac
+
+    def __setitem__(self, ip, mac):
+        self.learn(ip, mac)
+
+    def pop(self, ip, default=None):
+        with self._lock:
+            ent = self._entries.pop(ip, None)
+        if ent is None or ent.mac is None:
+            return default
+        return ent.mac
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def items(self):
+        now = time.monotonic()
+        with self._lock:
+            return [(ip, ent.mac) for ip, ent in self._entries.items()
+                    if ent.mac is not None and not self._expired(ent, now)]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return f'NeighborCache({dict(self.items())!r})'
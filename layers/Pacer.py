@@ -0,0 +1,101 @@
+import threading
+import time
+
+
+class Pacer:
+    """송신 속도 조절기 (토큰 버킷 / GCRA 방식)
+
+    rate_pps(초당 패킷) 또는 rate_bps(초당 비트) 목표에 맞춰 burst개 단위로 내보낸다.
+    둘 다 주면 더 느린 쪽을 따르고, 둘 다 None이면 속도 제한 없이 통계만 기록한다.
+    time.sleep은 요청보다 수십~수백 us 늦게 깨어나므로 마지막 spin_threshold초는
+    monotonic 시계를 보며 바쁜 대기로 맞춘다.
+    """
+    # rate_bps만 지정했을 때 burst 크기 계산에 쓰는 패킷 크기
+    NOMINAL_PACKET_SIZE = 1500
+
+    def __init__(self, rate_pps: float = None, rate_bps: float = None,
+                 burst: int = 32, spin_threshold: float = 0.0005):
+        self.rate_pps = rate_pps
+        self.rate_bps = rate_bps
+        self.burst = max(1, int(burst))
+        self.spin_threshold = spin_threshold
+
+        self._lock = threading.Lock()
+        self._tat = 0.0   # 다음 송신 가능 이론 시각 (theoretical arrival time)
+        self.reset_stats()
+
+    def _cost(self, packets, nbytes):
+        """packets개 / nbytes 바이트를 보내는 데 필요한 시간(초)"""
+        cost = 0.0
+        if self.rate_pps:
+            cost = packets / self.rate_pps
+        if self.rate_bps:
+            cost = max(cost, nbytes * 8 / self.rate_bps)
+        return cost
+
+    def acquire(self, packets: int = 1, nbytes: int = 0):
+        """packets개(총 nbytes)를 보내도 될 때까지 대기"""
+        burst_cost = self._cost(self.burst, self.burst * self.NOMINAL_PACKET_SIZE)
+        cost = self._cost(packets, nbytes)
+
+        with self._lock:
+            now = time.monotonic()
+            base = max(self._tat, now)
+            # 여러 스레드가 같이 써도 겹치지 않도록 송신 시각을 먼저 예약
+            start = base + cost - burst_cost
+            self._tat = base + cost
+
+        delay = start - now
+        if delay > 0:
+            self._wait_until(start, delay)
+
+        sent = time.monotonic()
+        with self._lock:
+            st = self.stats
+            if st['first_ts'] is None:
+                st['first_ts'] = sent
+            st['last_ts'] = sent
+            st['packets'] += packets
+            st['bytes'] += nbytes
+            st['bursts'] += 1
+            if delay > 0:
+                st['waits'] += 1
+                st['late_total'] += max(0.0, sent - start)
+                st['late_max'] = max(st['late_max'], sent - start)
+
+    def _wait_until(self, deadline, delay):
+        if delay > self.spin_threshold:
+            time.sleep(delay - self.spin_threshold)
+        while time.monotonic() < deadline:
+            pass
+
+    def reset_stats(self):
+        self.stats = {'packets': 0, 'bytes': 0, 'bursts': 0, 'waits': 0,
+                      'late_total': 0.0, 'late_max': 0.0,
+                      'first_ts': None, 'last_ts': None}
+
+    def get_stats(self):
+        """목표 속도와 실제 달성 속도 비교"""
+        with self._lock:
+            st = dict(self.stats)
+        elapsed = 0.0
+        if st['first_ts'] is not None:
+            elapsed = st['last_ts'] - st['first_ts']
+        # 마지막 burst가 차지하는 시간만큼 보정해 packets/elapsed 과대평가 방지
+        if st['bursts'] > 1 and elapsed > 0:
+            per_burst = elapsed / (st['bursts'] - 1)
+            elapsed += per_burst
+        achieved_pps = st['packets'] / elapsed if elapsed > 0 else None
+        achieved_bps = st['bytes'] * 8 / elapsed if elapsed > 0 else None
+        return {
+            'target_pps': self.rate_pps,
+            'target_bps': self.rate_bps,
+            'burst': self.burst,
+            'achieved_pps': achieved_pps,
+            'achieved_bps': achieved_bps,
+            'packets': st['packets'],
+            'bytes': st['bytes'],
+            'waits': st['waits'],
+            'late_avg_us': (st['late_total'] / st['waits'] * 1e6) if st['waits'] else 0.0,
+            'late_max_us': st['late_max'] * 1e6,
+        }
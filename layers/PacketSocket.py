@@ -0,0 +1,336 @@
+import os
+import mmap
+import select
+import socket
+import struct
+import threading
+import ctypes
+
+# Linux AF_PACKET 상수 (socket 모듈에 없는 것들)
+ETH_P_ALL = 0x0003
+SO_ATTACH_FILTER = 26
+PACKET_OUTGOING = 4
+
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+
+# 우리 스택이 사용하는 EtherType (IP/Chat, ARP, 묶음 프레임)
+ETHER_TYPES = (0xFFFF, 0x0806, 0xFFFE)
+
+# classic BPF opcode
+_BPF_LD_W_ABS = 0x20
+_BPF_LD_H_ABS = 0x28
+_BPF_JEQ_K = 0x15
+_BPF_RET_K = 0x06
+_BPF_ACCEPT = 0x40000
+
+
+def is_supported():
+    """AF_PACKET raw 소켓 사용 가능 여부 (Linux 전용)"""
+    return hasattr(socket, 'AF_PACKET')
+
+
+def build_filter(mac=None, ether_types=ETHER_TYPES):
+    """EtherType + 목적지 MAC(내 MAC 또는 브로드캐스트) 필터 BPF 프로그램 생성
+
+    반환값: (code, jt, jf, k) 튜플 리스트
+    mac이 None이면 EtherType만 검사한다.
+    """
+    n = len(ether_types)
+    prog = [(_BPF_LD_H_ABS, 0, 0, 12)]
+
+    if mac is None:
+        # [0] ldh [12] / [1..n] jeq type / [n+1] accept / [n+2] reject
+        accept, reject = n + 1, n + 2
+        for i, et in enumerate(ether_types):
+            idx = 1 + i
+            jf = 0 if i < n - 1 else reject - (idx + 1)
+            prog.append((_BPF_JEQ_K, accept - (idx + 1), jf, et))
+        prog.append((_BPF_RET_K, 0, 0, _BPF_ACCEPT))
+        prog.append((_BPF_RET_K, 0, 0, 0))
+        return prog
+
+    # 목적지 MAC 검사 블록 시작 위치
+    base = n + 1
+    reject = base + 8
+    for i, et in enumerate(ether_types):
+        idx = 1 + i
+        jf = 0 if i < n - 1 else reject - (idx + 1)
+        prog.append((_BPF_JEQ_K, base - (idx + 1), jf, et))
+
+    mac = bytes(mac)
+    lo32 = int.from_bytes(mac[2:6], 'big')
+    hi16 = int.from_bytes(mac[0:2], 'big')
+    prog += [
+        (_BPF_LD_W_ABS, 0, 0, 2),            # base+0: ld [2]
+        (_BPF_JEQ_K, 0, 2, lo32),            # base+1: 내 MAC 하위 4바이트?
+        (_BPF_LD_H_ABS, 0, 0, 0),            # base+2: ldh [0]
+        (_BPF_JEQ_K, 3, 4, hi16),            # base+3: 내 MAC 상위 2바이트? -> accept / reject
+        (_BPF_JEQ_K, 0, 3, 0xFFFFFFFF),      # base+4: 브로드캐스트 하위 4바이트?
+        (_BPF_LD_H_ABS, 0, 0, 0),            # base+5: ldh [0]
+        (_BPF_JEQ_K, 0, 1, 0xFFFF),          # base+6: 브로드캐스트 상위 2바이트?
+        (_BPF_RET_K, 0, 0, _BPF_ACCEPT),     # base+7: accept
+        (_BPF_RET_K, 0, 0, 0),               # base+8: reject
+    ]
+    return prog
+
+
+def attach_filter(sock, prog):
+    """SO_ATTACH_FILTER로 BPF 프로그램을 소켓에 부착 (기존 필터는 교체됨)"""
+    raw = b''.join(struct.pack('HBBI', *ins) for ins in prog)
+    buf = ctypes.create_string_buffer(raw, len(raw))
+    fprog = struct.pack('HP', len(prog), ctypes.addressof(buf))
+    # 커널이 setsockopt 시점에 프로그램을 복사하므로 buf는 이 함수 안에서만 유지하면 됨
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+def open_rx_socket(iface, mac=None, rcvbuf=4 * 1024 * 1024):
+    """필터가 부착된 수신용 AF_PACKET 소켓 생성
+
+    protocol 0으로 만든 소켓은 bind 전까지 아무 프레임도 받지 않으므로,
+    필터를 먼저 붙이고 bind해서 필터링되지 않은 프레임이 섞이는 것을 막는다.
+    """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        attach_filter(sock, build_filter(mac))
+        sock.bind((iface, ETH_P_ALL))
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+def read_stats(sock):
+    """PACKET_STATISTICS 읽기 -> (packets, drops, freeze_q_cnt)
+
+    커널은 읽을 때마다 카운터를 0으로 되돌리므로 호출 측에서 누적해야 한다.
+    """
+    raw = sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 12)
+    if len(raw) >= 12:
+        return struct.unpack('III', raw[:12])
+    packets, drops = struct.unpack('II', raw[:8])
+    return packets, drops, 0
+
+
+SIOCGIFMTU = 0x8921
+
+
+def get_mtu(iface):
+    """인터페이스 MTU 조회 (sysfs -> SIOCGIFMTU 순서, 실패하면 None)"""
+    if not iface:
+        return None
+    try:
+        with open(f'/sys/class/net/{iface}/mtu') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        pass
+    try:
+        import fcntl
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            req = struct.pack('16si', iface.encode()[:15], 0)
+            res = fcntl.ioctl(s.fileno(), SIOCGIFMTU, req)
+            return struct.unpack('16si', res)[1]
+    except (ImportError, OSError, AttributeError):
+        return None
+
+
+class PacketRing:
+    """TPACKET_V3 mmap 수신 링
+
+    커널이 블록 단위로 프레임을 채워 넘겨주면, 블록 안의 프레임을
+    mmap 영역의 memoryview 슬라이스(복사 없음)로 꺼낸다.
+    슬라이스는 release()로 블록을 커널에 돌려주기 전까지만 유효하다.
+    next_block으로 꺼낸 블록은 release 전까지 '사용 중'으로 표시되며, 링을 한 바퀴 돌아
+    사용 중인 블록 차례가 오면 release될 때까지 기다린다 (같은 블록 중복 전달 방지).
+    """
+    # 사용 중인 블록 대기 한 번의 최대 시간 (초). 지나면 None을 반환해 호출자가 종료 여부 확인
+    HELD_WAIT = 0.1
+
+    # tpacket_block_desc / tpacket3_hdr 오프셋
+    _BLK_STATUS = 8
+    _BLK_NUM_PKTS = 12
+    _BLK_FIRST = 16
+    _HDR_SIZE = 48          # TPACKET_ALIGN(sizeof(struct tpacket3_hdr))
+    _SLL_PKTTYPE = 10       # sockaddr_ll.sll_pkttype
+
+    def __init__(self, iface, mac=None, block_size=1 << 20, block_nr=32,
+                 frame_size=2048, retire_tov_ms=10):
+        self.block_size = block_size
+        self.block_nr = block_nr
+        self._cur = 0
+        self._held = set()   # 처리 스레드에 넘겼고 아직 release되지 않은 블록
+        self._held_cv = threading.Condition()
+        self.held_waits = 0
+
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            req = struct.pack('7I', block_size, block_nr, frame_size,
+                              (block_size // frame_size) * block_nr,
+                              retire_tov_ms, 0, 0)
+            sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+            self.mm = mmap.mmap(sock.fileno(), block_size * block_nr,
+                                mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            attach_filter(sock, build_filter(mac))
+            sock.bind((iface, ETH_P_ALL))
+        except Exception:
+            sock.close()
+            raise
+        self.sock = sock
+        self.view = memoryview(self.mm)
+        self._poll = select.poll()
+        self._poll.register(sock.fileno(), select.POLLIN | select.POLLERR)
+        self._extra_fds = []
+
+    def add_wakeup(self, fd):
+        """next_block 대기를 깨울 추가 fd 등록 (self-pipe 등)"""
+        self._poll.register(fd, select.POLLIN)
+        self._extra_fds.append(fd)
+
+    def next_block(self, timeout=1.0):
+        """사용자 소유가 된 다음 블록 번호 반환
+
+        timeout(초, None이면 무한) 동안 블록이 없거나 wakeup fd가 깨우면 None.
+        다음 블록이 아직 사용 중이면 최대 HELD_WAIT초 기다린 뒤 None.
+        """
+        with self._held_cv:
+            if self._cur in self._held:
+                self.held_waits += 1
+                wait = self.HELD_WAIT if timeout is None else min(timeout, self.HELD_WAIT)
+                self._held_cv.wait(wait)
+                if self._cur in self._held:
+                    return None
+        base = self._cur * self.block_size
+        status = struct.unpack_from('I', self.mm, base + self._BLK_STATUS)[0]
+        if not status & TP_STATUS_USER:
+            self._poll.poll(None if timeout is None else int(timeout * 1000))
+            status = struct.unpack_from('I', self.mm, base + self._BLK_STATUS)[0]
+            if not status & TP_STATUS_USER:
+                return None
+        blk = self._cur
+        with self._held_cv:
+            self._held.add(blk)
+        self._cur = (self._cur + 1) % self.block_nr
+        return blk
+
+    def frames(self, blk):
+        """블록 안의 수신 프레임을 memoryview 슬라이스로 반환 (송신 루프백 제외)"""
+        mm, view = self.mm, self.view
+        base = blk * self.block_size
+        num_pkts, off = struct.unpack_from('II', mm, base + self._BLK_NUM_PKTS)
+        out = []
+        p = base + off
+        for _ in range(num_pkts):
+            next_off, _sec, _nsec, snaplen = struct.unpack_from('IIII', mm, p)
+            mac_off = struct.unpack_from('H', mm, p + 24)[0]
+            if mm[p + self._HDR_SIZE + self._SLL_PKTTYPE] != PACKET_OUTGOING:
+                out.append(view[p + mac_off : p + mac_off + snaplen])
+            p += next_off
+        return out
+
+    def release(self, blk):
+        """블록을 커널에 반환"""
+        if not self.mm.closed:
+            struct.pack_into('I', self.mm, blk * self.block_size + self._BLK_STATUS, TP_STATUS_KERNEL)
+        with self._held_cv:
+            self._held.discard(blk)
+            self._held_cv.notify_all()
+
+    def close(self):
+        for fd in [self.sock.fileno()] + self._extra_fds:
+            try:
+                self._poll.unregister(fd)
+            except Exception:
+                pass
+        try:
+            self.view.release()
+            self.mm.close()
+        except BufferError:
+            # 상위 계층이 아직 슬라이스를 잡고 있으면 GC에 맡김
+            pass
+        self.sock.close()
+
+
+def open_tx_socket(iface, sndbuf=4 * 1024 * 1024):
+    """송신 전용 AF_PACKET 소켓 (프레임 수신은 하지 않음)"""
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        sock.bind((iface, 0))
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+# ==== sendmmsg (glibc) =======================================================
+class _IOVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_name', ctypes.c_void_p),
+        ('msg_namelen', ctypes.c_uint32),
+        ('msg_iov', ctypes.POINTER(_IOVec)),
+        ('msg_iovlen', ctypes.c_size_t),
+        ('msg_control', ctypes.c_void_p),
+        ('msg_controllen', ctypes.c_size_t),
+        ('msg_flags', ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _MsgHdr), ('msg_len', ctypes.c_uint)]
+
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _sendmmsg = _libc.sendmmsg
+    _sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    _sendmmsg.restype = ctypes.c_int
+except (OSError, AttributeError):
+    _sendmmsg = None
+
+
+def send_many(sock, frames):
+    """프레임 리스트를 가능한 한 적은 syscall로 전송 (sendmmsg, 없으면 send 반복)
+
+    반환값: 전송된 프레임 수
+    """
+    frames = [f if isinstance(f, bytes) else bytes(f) for f in frames]
+    if not frames:
+        return 0
+    if _sendmmsg is None or len(frames) == 1:
+        for f in frames:
+            sock.send(f)
+        return len(frames)
+
+    n = len(frames)
+    iovs = (_IOVec * n)()
+    msgs = (_MMsgHdr * n)()
+    for i, f in enumerate(frames):
+        # c_char_p는 bytes 내부 버퍼를 그대로 가리킴 (복사 없음), frames가 참조를 유지
+        iovs[i].iov_base = ctypes.cast(ctypes.c_char_p(f), ctypes.c_void_p)
+        iovs[i].iov_len = len(f)
+        msgs[i].msg_hdr.msg_iov = ctypes.pointer(iovs[i])
+        msgs[i].msg_hdr.msg_iovlen = 1
+
+    fd = sock.fileno()
+    base = ctypes.addressof(msgs)
+    step = ctypes.sizeof(_MMsgHdr)
+    sent = 0
+    while sent < n:
+        ptr = ctypes.cast(base + sent * step, ctypes.POINTER(_MMsgHdr))
+        r = _sendmmsg(fd, ptr, n - sent, 0)
+        if r < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        sent += r
+    return sent
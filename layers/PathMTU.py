@@ -0,0 +1,122 @@
+import struct
+import threading
+import time
+import random
+
+# PMTU 메시지: [type(1)][token(2)][mtu(4)] + (PROBE만) 패딩
+MSG = struct.Struct('!BHI')
+MSG_HELLO = 1        # 내 링크 MTU 알림
+MSG_HELLO_REPLY = 2  # 상대 링크 MTU 응답
+MSG_PROBE = 3        # 후보 MTU 크기로 채운 검사 패킷
+MSG_PROBE_ACK = 4    # 받은 IP 패킷 크기 응답
+
+
+class PathMtuDiscovery:
+    """피어별 사용 가능 IP 패킷 크기 협상 (IPLayer 보조 클래스)
+
+    1) HELLO로 서로의 링크 MTU를 교환해 후보(min)를 정하고
+    2) 후보 크기의 PROBE가 실제로 도착하는지 확인한다. 중간 스위치 등이 점보 프레임을
+       못 넘기면 CANDIDATES의 더 작은 값으로 다시 시도한다.
+    응답이 없는 (이 기능이 없는) 피어는 IPLayer.MTU를 사용한다.
+    """
+    CANDIDATES = (9000, 4096, 1500)
+    TIMEOUT = 0.3
+    HELLO_RETRIES = 2
+    TTL = 600.0
+
+    def __init__(self, ip):
+        self.ip = ip
+        self.table = {}      # dst_ip -> (mtu, 확인 시각)
+        self._lock = threading.Lock()
+        self._dst_locks = {}
+        self._waiters = {}   # token -> [Event, 응답 mtu]
+
+    def get(self, dst_ip):
+        rec = self.table.get(dst_ip)
+        if rec and time.monotonic() - rec[1] < self.TTL:
+            return rec[0]
+        return None
+
+    def set(self, dst_ip, mtu):
+        self.table[dst_ip] = (mtu, time.monotonic())
+
+    def get_or_discover(self, dst_ip, dst_mac):
+        mtu = self.get(dst_ip)
+        if mtu:
+            return mtu
+        with self._lock:
+            lock = self._dst_locks.setdefault(dst_ip, threading.Lock())
+        # 같은 피어로 동시에 보내도 협상은 한 번만
+        with lock:
+            mtu = self.get(dst_ip)
+            if mtu is None:
+                mtu = self.discover(dst_ip, dst_mac)
+        return mtu
+
+    def discover(self, dst_ip, dst_mac):
+        ip = self.ip
+        local = ip.get_link_mtu()
+        fallback = min(local, ip.MTU)
+        ip_str = '.'.join(str(b) for b in dst_ip)
+
+        peer = None
+        for _ in range(self.HELLO_RETRIES):
+            peer = self._request(dst_ip, dst_mac, MSG_HELLO, local)
+            if peer:
+                break
+        if not peer:
+            print(f'[IP] PMTU {ip_str}: no reply, using {fallback}')
+            self.set(dst_ip, fallback)
+            return fallback
+
+        cand = min(local, peer)
+        for size in [cand] + [c for c in self.CANDIDATES if c < cand]:
+            if size <= fallback:
+                break
+            got = self._request(dst_ip, dst_mac, MSG_PROBE, size, pad_to=size)
+            if got == size:
+                print(f'[IP] PMTU {ip_str}: {size} (local {local}, peer {peer})')
+                self.set(dst_ip, size)
+                return size
+        print(f'[IP] PMTU {ip_str}: probes failed, using {fallback}')
+        self.set(dst_ip, fallback)
+        return fallback
+
+    def _request(self, dst_ip, dst_mac, msg_type, mtu, pad_to=0):
+        token = random.randint(0, 65535)
+        waiter = [threading.Event(), None]
+        with self._lock:
+            self._waiters[token] = waiter
+        try:
+            self._send(dst_ip, dst_mac, msg_type, token, mtu, pad_to)
+            waiter[0].wait(self.TIMEOUT)
+            return waiter[1]
+        finally:
+            with self._lock:
+                self._waiters.pop(token, None)
+
+    def _send(self, dst_ip, dst_mac, msg_type, token, mtu, pad_to=0):
+        ip = self.ip
+        payload = MSG.pack(msg_type, token, mtu)
+        if pad_to:
+            payload += bytes(pad_to - ip.IP_HEADER_SIZE - len(payload))
+        # 조각내지 않고 패킷 하나로 그대로 보냄
+        pkt = ip.build_packet(dst_ip, ip.PROTOCOL_PMTU, ip.new_pkt_id(), 0, payload, 0)
+        ip.scheduler.submit(ip.PROTOCOL_PMTU, [pkt], dst_mac)
+        return True
+
+    def on_message(self, src_ip, src_mac, payload, ip_size):
+        if len(payload) < MSG.size:
+            return False
+        msg_type, token, mtu = MSG.unpack_from(payload, 0)
+        if msg_type == MSG_HELLO:
+            self._send(src_ip, src_mac, MSG_HELLO_REPLY, token, self.ip.get_link_mtu())
+        elif msg_type == MSG_PROBE:
+            self._send(src_ip, src_mac, MSG_PROBE_ACK, token, ip_size)
+        else:
+            with self._lock:
+                waiter = self._waiters.get(token)
+            if waiter:
+                waiter[1] = mtu
+                waiter[0].set()
+        return True
@@ -0,0 +1,76 @@
+import struct
+import threading
+import time
+
+# libpcap 파일 포맷 (https://wiki.wireshark.org/Development/LibpcapFileFormat)
+PCAP_MAGIC_USEC = 0xA1B2C3D4
+PCAP_MAGIC_NSEC = 0xA1B23C4D
+LINKTYPE_ETHERNET = 1
+
+_GLOBAL_HDR = struct.Struct('<IHHiIII')
+_REC_HDR = struct.Struct('<IIII')
+
+
+class PcapWriter:
+    """송수신 프레임을 타임스탬프와 함께 pcap 파일로 기록 (버퍼 사용, 스레드 안전)"""
+    def __init__(self, path, snaplen=65535, buffer_size=1 << 20):
+        self.path = path
+        self.snaplen = snaplen
+        self.lock = threading.Lock()
+        self.count = 0
+        self._f = open(path, 'wb', buffering=buffer_size)
+        self._f.write(_GLOBAL_HDR.pack(PCAP_MAGIC_USEC, 2, 4, 0, 0, snaplen, LINKTYPE_ETHERNET))
+
+    def write(self, frame, ts=None):
+        if ts is None:
+            ts = time.time()
+        sec = int(ts)
+        usec = int((ts - sec) * 1_000_000)
+        orig_len = len(frame)
+        incl = frame if orig_len <= self.snaplen else frame[:self.snaplen]
+        with self.lock:
+            f = self._f
+            if f is None:
+                return
+            f.write(_REC_HDR.pack(sec, usec, len(incl), orig_len))
+            f.write(incl)
+            self.count += 1
+
+    def flush(self):
+        with self.lock:
+            if self._f:
+                self._f.flush()
+
+    def close(self):
+        with self.lock:
+            f, self._f = self._f, None
+        if f:
+            f.close()
+
+
+def read_pcap(path):
+    """pcap 파일의 (timestamp, frame bytes)를 순서대로 반환하는 제너레이터"""
+    with open(path, 'rb') as f:
+        hdr = f.read(_GLOBAL_HDR.size)
+        if len(hdr) < _GLOBAL_HDR.size:
+            return
+        magic = struct.unpack('<I', hdr[:4])[0]
+        if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            endian = '<'
+        else:
+            endian = '>'
+            magic = struct.unpack('>I', hdr[:4])[0]
+            if magic not in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+                raise ValueError(f'Not a pcap file: {path}')
+        div = 1_000_000_000 if magic == PCAP_MAGIC_NSEC else 1_000_000
+        rec = struct.Struct(endian + 'IIII')
+
+        while True:
+            rh = f.read(rec.size)
+            if len(rh) < rec.size:
+                return
+            sec, frac, incl_len, _orig_len = rec.unpack(rh)
+            data = f.read(incl_len)
+            if len(data) < incl_len:
+                return
+            yield sec + frac / div, data
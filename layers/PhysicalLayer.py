@@ -1,34 +1,203 @@
+import os
 import threading
 import time
-from scapy.all import sniff, sendp
+import queue
+import select
+from scapy.all import AsyncSniffer, conf
 from .BaseLayer import BaseLayer
+from . import PacketSocket
+from .Pcap import PcapWriter
+
+class _CaptureSession:
+    """인터페이스 하나에 대한 캡처 스레드
+
+    stop()은 self-pipe에 1바이트를 써서 select/poll 대기를 즉시 깨운다.
+    """
+    def __init__(self, iface):
+        self.iface = iface
+        self.stop_event = threading.Event()
+        self.wake_r, self.wake_w = os.pipe()
+        self.sock = None    # 현재 수신 소켓 (필터 갱신/통계용)
+        self.thread = None
+
+    def stop(self):
+        self.stop_event.set()
+        try:
+            os.write(self.wake_w, b'x')
+        except OSError:
+            pass
+
+    def close(self):
+        for fd in (self.wake_r, self.wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
 
 class PhysicalLayer(BaseLayer):
-    def __init__(self, iface: str):
+    # 수신 백엔드
+    BACKEND_SCAPY = 'scapy'        # scapy sniff() (모든 OS)
+    BACKEND_AF_PACKET = 'afpacket' # 커널 BPF 필터 + raw 소켓 (Linux 전용)
+    BACKEND_RING = 'ring'          # 커널 BPF 필터 + TPACKET_V3 mmap 링 (Linux 전용)
+
+    # 수신 큐가 가득 찼을 때 정책
+    RX_POLICY_DROP = 'drop'    # 새 프레임 버림 (캡처 스레드는 절대 기다리지 않음)
+    RX_POLICY_BLOCK = 'block'  # 처리 스레드가 자리를 비울 때까지 캡처 대기
+
+    # MTU를 알아낼 수 없을 때 (Windows 등)
+    DEFAULT_MTU = 1500
+
+    def __init__(self, iface: str, backend: str = BACKEND_SCAPY,
+                 ring_blocks: int = 32, ring_block_size: int = 1 << 20,
+                 rx_queue_size: int = 8192, rx_policy: str = RX_POLICY_DROP):
         super().__init__()
         self.iface = iface
-        self._t = None
-        self._stop = threading.Event()
+        self.mtu = self._detect_mtu(iface)
+        self._stop = threading.Event()   # 계층 전체 종료 신호
+        self._cap = None                 # 현재 캡처 세션
+        self._cap_lock = threading.Lock()
+
+        if backend in (self.BACKEND_AF_PACKET, self.BACKEND_RING) and not PacketSocket.is_supported():
+            print('[PHY] AF_PACKET not supported on this platform. Falling back to scapy.')
+            backend = self.BACKEND_SCAPY
+        self.backend = backend
+        self.rx_mac = None   # BPF 필터에 사용할 내 MAC
+
+        # mmap 링 크기 (block_size는 페이지 크기의 배수)
+        self.ring_blocks = ring_blocks
+        self.ring_block_size = ring_block_size
+        # 커널 PACKET_STATISTICS 누적값 (커널은 읽을 때마다 초기화함)
+        self.rx_stats = {'packets': 0, 'drops': 0, 'freeze_q': 0}
+
+        # 인터페이스당 하나의 송신 소켓을 계속 재사용 (set_iface 시 재생성)
+        self._tx_sock = None
+        self._tx_lock = threading.Lock()
+
+        # pcap 캡처 탭 (None이면 기록 안 함)
+        self.capture = None
+
+        # 수신 파이프라인: 캡처 스레드 -> 제한 큐 -> 처리 스레드 -> upper.recv
+        # rx_queue_size=0 이면 큐 없이 캡처 스레드에서 바로 upper.recv 호출
+        self.rx_policy = rx_policy
+        self._rxq = queue.Queue(maxsize=rx_queue_size) if rx_queue_size > 0 else None
+        self._worker = None
+        self._worker_stop = threading.Event()
+        self.queue_stats = {'enqueued': 0, 'processed': 0, 'drops': 0, 'high_water': 0}
 
-    def set_iface(self, iface: str):
-        if self.iface == iface and self._t and self._t.is_alive():
+    def set_iface(self, iface: str, make_before_break: bool = False):
+        """인터페이스 변경
+
+        make_before_break=True면 새 인터페이스 캡처를 먼저 시작한 뒤
+        기존 캡처를 정리하므로 전환 중에도 수신이 끊기지 않는다.
+        """
+        if self.iface == iface and self._cap:
             print(f'[PHY] Interface already set to "{iface}" and running.')
             return
 
         print(f'[PHY] Interface changing from "{self.iface}" to "{iface}"...')
-
-        # self.running은 BaseLayer의 start()가 호출되어야 True가 됩니다.
-        if self.running:
-            self.stop()  # 기존 스니퍼 중지 (콘솔 로그 생성)
-
+        t0 = time.perf_counter()
         self.iface = iface
+        self.mtu = self._detect_mtu(iface)
+        self._close_tx()
 
-        if self.running:
-            self.start() # 새 인터페이스로 스니퍼 시작 (콘솔 로그 생성)
-            print(f'[PHY] Interface change complete for "{iface}".')
-        else:
+        if not self.running:
             print(f'[PHY] Interface set to "{iface}". (Will start when .run() is called)')
+            return
 
+        with self._cap_lock:
+            old = self._cap
+            if make_before_break:
+                self._cap = self._start_session(iface)
+        if old:
+            self._stop_session(old)
+        if not make_before_break:
+            with self._cap_lock:
+                self._cap = self._start_session(iface)
+
+        ms = (time.perf_counter() - t0) * 1000
+        print(f'[PHY] Interface change complete for "{iface}" ({ms:.1f} ms).')
+
+    def _detect_mtu(self, iface):
+        mtu = PacketSocket.get_mtu(iface)
+        if not mtu:
+            mtu = self.DEFAULT_MTU
+        print(f'[PHY] MTU of "{iface}": {mtu}')
+        return mtu
+
+    def get_mtu(self):
+        """이더넷 페이로드 최대 크기 (상위 계층 조각 크기 결정용)"""
+        return self.mtu
+
+    def set_rx_mac(self, mac: bytes):
+        """내 MAC 등록 -> AF_PACKET 백엔드에서 커널 필터 갱신"""
+        self.rx_mac = bytes(mac)
+        cap = self._cap
+        sock = cap.sock if cap else None
+        if sock is not None:
+            try:
+                PacketSocket.attach_filter(sock, PacketSocket.build_filter(self.rx_mac))
+            except OSError as e:
+                print(f'[PHY] filter update error: {e}')
+
+    def get_rx_stats(self):
+        """커널 수신/드롭 카운터 (afpacket, ring 백엔드)"""
+        cap = self._cap
+        self._collect_stats(cap.sock if cap else None)
+        return dict(self.rx_stats)
+
+    def get_queue_stats(self):
+        """수신 큐 깊이 / 최고 수위 / 드롭 카운터 (프레임 단위)"""
+        stats = dict(self.queue_stats)
+        stats['depth'] = self._rxq.qsize() if self._rxq else 0
+        return stats
+
+    def _collect_stats(self, sock):
+        if sock is None:
+            return
+        try:
+            packets, drops, freeze = PacketSocket.read_stats(sock)
+        except OSError:
+            return
+        self.rx_stats['packets'] += packets
+        self.rx_stats['drops'] += drops
+        self.rx_stats['freeze_q'] += freeze
+
+    # ==== pcap 캡처 ===========================================================
+    def start_capture(self, path: str):
+        """송수신 프레임 전체를 pcap 파일로 기록 시작"""
+        self.stop_capture()
+        self.capture = PcapWriter(path)
+        print(f'[PHY] Capture started: {path}')
+
+    def stop_capture(self):
+        cap, self.capture = self.capture, None
+        if cap:
+            cap.close()
+            print(f'[PHY] Capture stopped: {cap.path} ({cap.count} frames)')
+
+    # ==== 송신 ================================================================
+    def _get_tx(self):
+        sock = self._tx_sock
+        if sock is not None:
+            return sock
+        with self._tx_lock:
+            if self._tx_sock is None:
+                if self.backend in (self.BACKEND_AF_PACKET, self.BACKEND_RING):
+                    self._tx_sock = PacketSocket.open_tx_socket(self.iface)
+                else:
+                    self._tx_sock = conf.L2socket(iface=self.iface)
+                print(f'[PHY] TX socket opened on iface={self.iface}')
+            return self._tx_sock
+
+    def _close_tx(self):
+        with self._tx_lock:
+            sock, self._tx_sock = self._tx_sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except Exception:
+                pass
 
     def send(self, frame: bytes):
         if not self.iface:
@@ -36,33 +205,152 @@ class PhysicalLayer(BaseLayer):
             return False
         try:
             print(f'TX iface={self.iface} len={len(frame)}')
-            sendp(frame, iface=self.iface, verbose=False)
+            self._get_tx().send(frame)
+            cap = self.capture
+            if cap is not None:
+                cap.write(frame)
             return True
         except Exception as e:
             print(f'TX error: {e}')
+            self._close_tx()  # 다음 송신 때 소켓 재생성
             return False
 
-    def _sniff_loop(self):
-        print(f'[PHY] sniffer thread start on iface={self.iface}')
-        while not self._stop.is_set():
+    def send_many(self, frames):
+        """프레임 여러 개를 한 번에 송신 (AF_PACKET 백엔드는 sendmmsg 사용)"""
+        if not self.iface:
+            print('TX aborted: iface not set')
+            return False
+        try:
+            sock = self._get_tx()
+            if self.backend in (self.BACKEND_AF_PACKET, self.BACKEND_RING):
+                PacketSocket.send_many(sock, frames)
+            else:
+                for frame in frames:
+                    sock.send(frame)
+            cap = self.capture
+            if cap is not None:
+                ts = time.time()
+                for frame in frames:
+                    cap.write(frame, ts)
+            return True
+        except Exception as e:
+            print(f'TX error: {e}')
+            self._close_tx()
+            return False
+
+    def _rx_loop(self, cap):
+        if self.backend == self.BACKEND_RING:
+            self._ring_loop(cap)
+        elif self.backend == self.BACKEND_AF_PACKET:
+            self._raw_loop(cap)
+        else:
+            self._sniff_loop(cap)
+
+    def _raw_loop(self, cap):
+        """AF_PACKET 수신 루프: 커널 필터를 통과한 프레임만 raw bytes로 상위 전달"""
+        print(f'[PHY] raw socket thread start on iface={cap.iface}')
+        while not cap.stop_event.is_set():
+            if not cap.iface:
+                print('[PHY] Raw loop paused: iface not set.')
+                cap.stop_event.wait(2)
+                continue
+            try:
+                sock = PacketSocket.open_rx_socket(cap.iface, self.rx_mac)
+            except OSError as e:
+                print(f'[PHY] raw socket open error: {e}')
+                cap.stop_event.wait(1)
+                continue
+
+            cap.sock = sock
             try:
-                if not self.iface:
-                    print('[PHY] Sniff loop paused: iface not set.')
-                    time.sleep(2)
-                    continue
-
-                sniff(
-                    iface=self.iface,
-                    store=False,
-                    prn=self._on_pkt,
-                    timeout=10
-                )
+                while not cap.stop_event.is_set():
+                    r, _, _ = select.select([sock, cap.wake_r], [], [])
+                    if sock not in r:
+                        continue
+                    raw, addr = sock.recvfrom(65535)
+                    # 내가 보낸 프레임이 되돌아온 것은 무시
+                    if addr[2] == PacketSocket.PACKET_OUTGOING:
+                        continue
+                    self._deliver(raw)
+            except OSError as e:
+                print(f'[PHY] raw recv error: {e}')
+                cap.stop_event.wait(1)
+            finally:
+                self._collect_stats(sock)
+                cap.sock = None
+                sock.close()
+
+        print(f'[PHY] raw socket thread exit (iface={cap.iface})')
+
+    def _ring_loop(self, cap):
+        """TPACKET_V3 링 수신 루프: 블록 단위로 프레임을 memoryview로 상위 전달
+
+        상위 계층은 recv() 안에서 프레임을 처리(또는 복사)해야 하며,
+        블록이 커널로 반환된 뒤에는 슬라이스 내용이 바뀔 수 있다.
+        """
+        print(f'[PHY] ring thread start on iface={cap.iface}')
+        while not cap.stop_event.is_set():
+            if not cap.iface:
+                print('[PHY] Ring loop paused: iface not set.')
+                cap.stop_event.wait(2)
+                continue
+            try:
+                ring = PacketSocket.PacketRing(cap.iface, self.rx_mac,
+                                               block_size=self.ring_block_size,
+                                               block_nr=self.ring_blocks)
+            except OSError as e:
+                print(f'[PHY] ring open error: {e}')
+                cap.stop_event.wait(1)
+                continue
+
+            ring.add_wakeup(cap.wake_r)
+            cap.sock = ring.sock
+            try:
+                while not cap.stop_event.is_set():
+                    blk = ring.next_block(timeout=None)
+                    if blk is None:
+                        continue
+                    # 블록은 처리 스레드가 다 쓴 뒤 커널로 반환됨. 반환 전에는 next_block이
+                    # 같은 블록을 다시 주지 않으므로(링 한 바퀴 이상 밀리면 대기) 큐에 한 번만 들어감
+                    self._deliver_batch(ring.frames(blk), lambda b=blk, r=ring: r.release(b))
+            except OSError as e:
+                print(f'[PHY] ring recv error: {e}')
+                cap.stop_event.wait(1)
+            finally:
+                self._collect_stats(ring.sock)
+                cap.sock = None
+                ring.close()
+
+        print(f'[PHY] ring thread exit (iface={cap.iface})')
+
+    def _sniff_loop(self, cap):
+        """scapy 수신 루프: AsyncSniffer.stop()으로 즉시 중단 가능"""
+        print(f'[PHY] sniffer thread start on iface={cap.iface}')
+        while not cap.stop_event.is_set():
+            if not cap.iface:
+                print('[PHY] Sniff loop paused: iface not set.')
+                cap.stop_event.wait(2)
+                continue
+            try:
+                sniffer = AsyncSniffer(iface=cap.iface, store=False, prn=self._on_pkt)
+                sniffer.start()
             except Exception as e:
-                # 인터페이스가 갑자기 사라지거나 할 때 오류 발생 가능
                 print(f'[PHY] sniff error: {e}')
-                time.sleep(1)
+                cap.stop_event.wait(1)
+                continue
+
+            # 중지 요청 또는 스니퍼 비정상 종료(인터페이스 소실 등)까지 대기
+            while not cap.stop_event.wait(1.0):
+                if not sniffer.running:
+                    print('[PHY] sniffer stopped unexpectedly. Restarting...')
+                    break
+            try:
+                if sniffer.running:
+                    sniffer.stop()
+            except Exception as e:
+                print(f'[PHY] sniff stop error: {e}')
 
-        print('[PHY] sniffer thread exit')
+        print(f'[PHY] sniffer thread exit (iface={cap.iface})')
 
     def _on_pkt(self, pkt):
         raw = getattr(pkt, 'original', None)
@@ -72,18 +360,128 @@ class PhysicalLayer(BaseLayer):
             except Exception:
                 return
         print(f'[PHY] RX {len(raw)} bytes')
-        if self.upper:
-            self.upper.recv(raw)
+        self._deliver(raw)
 
-    def start(self):
-        if self._t and self._t.is_alive():
+    def _deliver(self, frame):
+        """수신 프레임 공통 처리: 캡처 탭 기록 후 처리 단계로 전달"""
+        self._deliver_batch((frame,), None)
+
+    def _deliver_batch(self, frames, release):
+        """캡처 단계: 프레임 묶음을 큐에 넣음 (release는 처리 후 호출할 콜백)"""
+        cap = self.capture
+        if cap is not None:
+            ts = time.time()
+            for frame in frames:
+                cap.write(frame, ts)
+
+        rxq = self._rxq
+        if rxq is None:
+            self._process(frames, release)
             return
+
+        item = (frames, release)
+        stats = self.queue_stats
+        if self.rx_policy == self.RX_POLICY_BLOCK:
+            while True:
+                try:
+                    rxq.put(item, timeout=0.5)
+                    break
+                except queue.Full:
+                    if self._stop.is_set():
+                        stats['drops'] += len(frames)
+                        if release:
+                            release()
+                        return
+        else:
+            try:
+                rxq.put_nowait(item)
+            except queue.Full:
+                stats['drops'] += len(frames)
+                if release:
+                    release()
+                return
+
+        stats['enqueued'] += len(frames)
+        depth = rxq.qsize()
+        if depth > stats['high_water']:
+            stats['high_water'] = depth
+
+    def _process(self, frames, release):
+        """처리 단계: 상위 계층 recv 호출"""
+        try:
+            for frame in frames:
+                if self.upper:
+                    try:
+                        self.upper.recv(frame)
+                    except Exception as e:
+                        print(f'[PHY] upper recv error: {e}')
+            self.queue_stats['processed'] += len(frames)
+        finally:
+            if release:
+                release()
+
+    def _worker_loop(self):
+        rxq = self._rxq
+        while not self._worker_stop.is_set():
+            try:
+                frames, release = rxq.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if frames is None:  # 종료 신호
+                continue
+            self._process(frames, release)
+
+    def _start_worker(self):
+        if self._rxq is None or (self._worker and self._worker.is_alive()):
+            return
+        self._worker_stop.clear()
+        self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+        self._worker.start()
+
+    def _stop_worker(self):
+        self._worker_stop.set()
+        if self._worker:
+            try:
+                self._rxq.put_nowait((None, None))  # 대기 중인 get()을 바로 깨움
+            except queue.Full:
+                pass
+            self._worker.join(timeout=2)
+            self._worker = None
+        # 남은 항목 정리 (링 블록은 반환)
+        while self._rxq is not None:
+            try:
+                frames, release = self._rxq.get_nowait()
+            except queue.Empty:
+                break
+            if frames is not None and release:
+                release()
+
+    # ==== 캡처 세션 관리 ======================================================
+    def _start_session(self, iface):
+        cap = _CaptureSession(iface)
+        cap.thread = threading.Thread(target=self._rx_loop, args=(cap,), daemon=True)
+        cap.thread.start()
+        return cap
+
+    def _stop_session(self, cap):
+        cap.stop()
+        if cap.thread:
+            cap.thread.join(timeout=2)
+        cap.close()
+
+    def start(self):
+        self.running = True
         self._stop.clear()
-        self._t = threading.Thread(target=self._sniff_loop, daemon=True)
-        self._t.start()
+        self._start_worker()
+        with self._cap_lock:
+            if self._cap is None:
+                self._cap = self._start_session(self.iface)
 
     def stop(self):
+        self.running = False
         self._stop.set()
-        if self._t:
-            self._t.join(timeout=12)
-            self._t = None
\ No newline at end of file
+        with self._cap_lock:
+            cap, self._cap = self._cap, None
+        if cap:
+            self._stop_session(cap)
+        self._stop_worker()
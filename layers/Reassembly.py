@@ -0,0 +1,430 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class Datagram:
+    """조각난 데이터그램 하나의 재조립 상태
+
+    조각은 도착 즉시 buf의 offset 위치에 기록한다. 송신 측은 마지막 조각을 빼면
+    같은 크기(frag_size)로 자르므로, 첫 MF=1 조각에서 frag_size를 알아낸 뒤에는
+    offset // frag_size 번째 칸을 표시하는 바이트맵으로 중복을 O(1)에 검사한다.
+    frag_size를 모르거나 규칙에서 벗어난 조각은 irregular(offset -> 길이)에 둔다.
+    """
+    streaming = False
+    __slots__ = ('src', 'pkt_id', 'proto', 'buf', 'frag_size', 'seen', 'irregular',
+                 'received', 'total_len', 'count', 'created', 'last_ts',
+                 'ack_highest', 'ack_unacked')
+
+    def __init__(self, src, pkt_id, proto, now=None):
+        self.src = src
+        self.pkt_id = pkt_id
+        self.proto = proto
+        self.buf = bytearray()
+        self.frag_size = 0
+        self.seen = bytearray()   # seen[i] == 1 -> offset i*frag_size 조각 수신
+        self.irregular = {}
+        self.received = 0
+        self.total_len = None
+        self.count = 0
+        self.created = self.last_ts = now if now is not None else time.monotonic()
+        # 신뢰 전송(ReliableTransport) ACK 시점 판단용
+        self.ack_highest = -1
+        self.ack_unacked = 0
+
+    @property
+    def size(self):
+        """현재 차지하는 버퍼 크기 (바이트)"""
+        return len(self.buf)
+
+    @property
+    def complete(self):
+        return self.total_len is not None and self.received >= self.total_len
+
+    def _learn_frag_size(self, size):
+        self.frag_size = size
+        # 미리 받아 둔 조각 중 규칙에 맞는 것은 바이트맵으로 옮김
+        for off, length in list(self.irregular.items()):
+            if off % size == 0 and length <= size:
+                self._mark(off // size)
+                del self.irregular[off]
+
+    def _mark(self, idx):
+        seen = self.seen
+        if idx >= len(seen):
+            seen.extend(bytes(idx + 1 - len(seen)))
+        seen[idx] = 1
+
+    def _is_dup(self, offset, length):
+        fs = self.frag_size
+        if fs and offset % fs == 0 and length <= fs:
+            idx = offset // fs
+            return idx < len(self.seen) and self.seen[idx] == 1
+        return offset in self.irregular
+
+    def required_size(self, offset, length, mf):
+        """이 조각을 넣은 뒤 buf 크기 (할당 전에 메모리 예산 검사용)"""
+        end = offset + length
+        total = end if not mf else self.total_len
+        return max(len(self.buf), end, total or 0)
+
+    def add(self, offset, payload, mf, now=None):
+        """조각 추가. 중복이면 False"""
+        length = len(payload)
+        if mf and not self.frag_size and length:
+            self._learn_frag_size(length)
+
+        if self._is_dup(offset, length):
+            return False
+
+        end = offset + length
+        if not mf:
+            self.total_len = end
+        buf = self.buf
+        need = end if self.total_len is None else max(end, self.total_len)
+        if offset == len(buf) and need == end:
+            buf += payload
+        else:
+            if need > len(buf):
+                # 전체 크기를 알면 한 번에 확보, 아니면 이 조각 끝까지 확장
+                buf.extend(bytes(need - len(buf)))
+            # memoryview로 대입해야 임시 복사 없이 바로 기록됨
+            with memoryview(buf) as m:
+                m[offset:end] = payload
+
+        self._record(offset, length, now)
+        return True
+
+    def _record(self, offset, length, now):
+        """수신 표시 (바이트맵 또는 irregular) 및 카운터 갱신"""
+        fs = self.frag_size
+        if fs and offset % fs == 0 and length <= fs:
+            self._mark(offset // fs)
+        else:
+            self.irregular[offset] = length
+
+        self.received += length
+        self.count += 1
+        self.last_ts = now if now is not None else time.monotonic()
+
+    def data(self):
+        """재조립된 데이터 (복사 없는 memoryview)"""
+        return memoryview(self.buf)[:self.total_len]
+
+    def abort(self):
+        """만료/제거될 때 호출 (버퍼형은 할 일 없음)"""
+        pass
+
+
+class StreamDatagram(Datagram):
+    """스트리밍 수신용 데이터그램
+
+    전체를 모으지 않고, 앞에서부터 이어지는 데이터가 생길 때마다
+    sink.on_data(key, offset, chunk)로 바로 넘긴다. 순서가 어긋나 먼저 온 조각만
+    held에 잠시 보관하므로 메모리는 파일 크기가 아니라 손실/재정렬 구간 크기에 비례한다.
+    sink는 on_begin(key, src_ip) / on_data(key, offset, chunk) / on_end(key, ok)를 구현한다.
+    sink 호출은 calls에 쌓아 두었다가 관리자 잠금을 푼 뒤 run_calls()에서 순서대로 실행한다
+    (sink가 디스크 쓰기 등으로 느려도 다른 데이터그램의 재조립을 막지 않도록).
+    """
+    streaming = True
+    __slots__ = ('key', 'sink', 'held', 'held_bytes', 'next_off', 'begun', 'calls', 'call_lock')
+
+    def __init__(self, src, pkt_id, proto, sink, key, now=None):
+        super().__init__(src, pkt_id, proto, now)
+        self.key = key
+        self.sink = sink
+        self.held = {}        # offset -> bytes (아직 앞이 비어서 못 넘긴 조각)
+        self.held_bytes = 0
+        self.next_off = 0     # 여기까지 상위로 넘김
+        self.begun = False
+        self.calls = deque()  # (sink 메서드, 인자) - 잠금 밖에서 실행
+        self.call_lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self.held_bytes
+
+    @property
+    def complete(self):
+        return self.total_len is not None and self.next_off >= self.total_len
+
+    def required_size(self, offset, length, mf):
+        if offset == self.next_off:
+            return self.held_bytes
+        return self.held_bytes + length
+
+    def add(self, offset, payload, mf, now=None):
+        length = len(payload)
+        if mf and not self.frag_size and length:
+            self._learn_frag_size(length)
+
+        if self._is_dup(offset, length) or offset < self.next_off:
+            return False
+
+        end = offset + length
+        if not mf:
+            self.total_len = end
+        if not self.begun:
+            self.begun = True
+            self.calls.append((self.sink.on_begin, (self.key, self.src)))
+
+        if offset == self.next_off:
+            # 바로 이어지는 조각은 복사 없이 넘기고, 보관 중이던 뒤 조각들도 이어서 넘김
+            self.calls.append((self.sink.on_data, (self.key, offset, payload)))
+            self.next_off = end
+            held = self.held
+            while self.next_off in held:
+                chunk = held.pop(self.next_off)
+                self.held_bytes -= len(chunk)
+                self.calls.append((self.sink.on_data, (self.key, self.next_off, chunk)))
+                self.next_off += len(chunk)
+        else:
+            self.held[offset] = bytes(payload)
+            self.held_bytes += length
+
+        self._record(offset, length, now)
+        if self.complete:
+            self.calls.append((self.sink.on_end, (self.key, True)))
+        return True
+
+    def data(self):
+        raise TypeError('StreamDatagram does not keep its data')
+
+    def abort(self):
+        self.held.clear()
+        self.held_bytes = 0
+        if self.begun and not self.complete:
+            self.calls.append((self.sink.on_end, (self.key, False)))
+
+    def run_calls(self):
+        """쌓인 sink 호출 실행 (관리자 잠금 밖에서, 데이터그램 단위로 순서 보장)"""
+        with self.call_lock:
+            calls = self.calls
+            while calls:
+                func, args = calls.popleft()
+                try:
+                    func(*args)
+                except Exception as e:
+                    print(f'[IP] Stream sink Error ID:{self.pkt_id}: {e}')
+
+
+class ReassemblyManager:
+    """재조립 중인 데이터그램 관리 (타임아웃, 메모리 예산, 출발지별 제한)
+
+    - timeout초 동안 새 조각이 없으면 만료
+    - 전체 버퍼 합이 max_bytes를 넘으려 하면 가장 오래 갱신되지 않은 것부터 제거
+    - 출발지 하나가 per_source_max개 / per_source_bytes 바이트를 넘으려 하면 그 출발지의 오래된 것부터 제거
+      (출발지의 유일한 데이터그램은 per_source_bytes와 무관하게 max_bytes까지 허용)
+    메모리 검사는 버퍼를 늘리기 전에 하므로 예산을 넘는 할당은 일어나지 않는다.
+    만료 검사는 재조립 중인 데이터그램이 있는 동안 백그라운드 타이머가 주기적으로 한다.
+    최근 완료한 키를 COMPLETED_MAX개까지 timeout초 동안 기억해, 완료 뒤 늦게 온 재전송 조각
+    (offset > 0)이 새 데이터그램을 만들고 버퍼를 잡지 않게 한다.
+    """
+    COMPLETED_MAX = 1024
+
+    def __init__(self, timeout: float = 30.0, max_bytes: int = 1 << 30,
+                 per_source_max: int = 64, per_source_bytes: int = None):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.per_source_max = per_source_max
+        # 기본값은 전체 예산의 1/4 (max_bytes를 바꾸면 같이 따라감)
+        self._per_source_bytes = per_source_bytes
+
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()     # key -> Datagram (앞쪽이 가장 오래 갱신 안 된 것)
+        self._by_src = {}             # src -> OrderedDict(key -> None)
+        self._src_bytes = {}          # src -> 바이트 합
+        self.total_bytes = 0
+        self._pending = []            # sink 호출이 쌓인 StreamDatagram (잠금 밖에서 실행)
+        self._timer = None
+        self._stop = threading.Event()
+        self._completed = OrderedDict()   # 최근 완료한 key -> 완료 시각
+        self.stats = {'completed': 0, 'expired': 0, 'expired_bytes': 0,
+                      'evicted': 0, 'evicted_bytes': 0, 'rejected': 0, 'rejected_bytes': 0,
+                      'duplicates': 0}
+
+    @property
+    def per_source_bytes(self):
+        if self._per_source_bytes is None:
+            return self.max_bytes // 4
+        return self._per_source_bytes
+
+    @per_source_bytes.setter
+    def per_source_bytes(self, value):
+        self._per_source_bytes = value
+
+    def __contains__(self, key):
+        return key in self._lru
+
+    def __len__(self):
+        return len(self._lru)
+
+    # ==== 내부 관리 (self._lock 안에서 호출) =====================================
+    def _remove(self, key):
+        dg = self._lru.pop(key)
+        src_keys = self._by_src[dg.src]
+        del src_keys[key]
+        self._src_bytes[dg.src] -= dg.size
+        if not src_keys:
+            del self._by_src[dg.src]
+            del self._src_bytes[dg.src]
+        self.total_bytes -= dg.size
+        return dg
+
+    def _evict(self, key, reason='evicted'):
+        dg = self._remove(key)
+        self.stats[reason] += 1
+        self.stats[reason + '_bytes'] += dg.size
+        print(f"[IP] Reassembly {reason} ID:{dg.pkt_id} ({dg.received}/{dg.total_len or '???'} bytes)")
+        self._abort(dg)
+
+    def _abort(self, dg):
+        dg.abort()
+        if dg.streaming:
+            self._pending.append(dg)
+
+    def _take_pending(self):
+        pending, self._pending = self._pending, []
+        return pending
+
+    def _expire(self, now):
+        deadline = now - self.timeout
+        while self._lru:
+            key, dg = next(iter(self._lru.items()))
+            if dg.last_ts > deadline:
+                break
+            self._evict(key, 'expired')
+
+    def _make_room(self, key, src, delta):
+        """key 데이터그램이 delta 바이트 늘어날 수 있게 다른 것을 정리. 불가능하면 False"""
+        src_keys = self._by_src.get(src, ())
+        limit = self.per_source_bytes
+        for old in list(src_keys):
+            if self._src_bytes[src] + delta <= limit:
+                break
+            if old != key:
+                self._evict(old)
+        # 출발지에 이것 하나만 남았으면 출발지 한도 대신 전체 예산만 적용 (큰 단일 전송 허용)
+        sole = len(self._by_src.get(src, ())) <= 1
+        if not sole and self._src_bytes.get(src, 0) + delta > limit:
+            return False
+        for old in list(self._lru):
+            if self.total_bytes + delta <= self.max_bytes:
+                break
+            if old != key:
+                self._evict(old)
+        return self.total_bytes + delta <= self.max_bytes
+
+    # ==== 외부 인터페이스 ========================================================
+    def add(self, key, src, pkt_id, proto, offset, payload, mf, sink=None):
+        """조각 추가
+
+        (datagram, added)를 반환. datagram이 완성되면 관리 목록에서 빠진 상태로 돌려주며,
+        예산 때문에 받을 수 없거나 이미 완료한 데이터그램의 재전송 조각이면 (None, False).
+        sink를 주면 새 데이터그램을 StreamDatagram으로 만들어 sink로 바로 흘려보낸다.
+        sink 호출은 잠금을 푼 뒤, 반환하기 전에 실행된다.
+        """
+        with self._lock:
+            result = self._add(key, src, pkt_id, proto, offset, payload, mf, sink)
+            pending = self._take_pending()
+        for dg in pending:
+            dg.run_calls()
+        return result
+
+    def _add(self, key, src, pkt_id, proto, offset, payload, mf, sink):
+        now = time.monotonic()
+        dg = self._lru.get(key)
+        if dg is None:
+            done_at = self._completed.get(key)
+            if done_at is not None:
+                if offset > 0 and now - done_at < self.timeout:
+                    self.stats['duplicates'] += 1
+                    return None, False
+                # offset 0부터 다시 오면 같은 ID를 쓰는 새 데이터그램
+                del self._completed[key]
+            src_keys = self._by_src.get(src)
+            if src_keys is not None and len(src_keys) >= self.per_source_max:
+                self._evict(next(iter(src_keys)))
+            if sink is not None:
+                dg = StreamDatagram(src, pkt_id, proto, sink, key, now)
+            else:
+                dg = Datagram(src, pkt_id, proto, now)
+            self._lru[key] = dg
+            self._by_src.setdefault(src, OrderedDict())[key] = None
+            self._src_bytes.setdefault(src, 0)
+            self._ensure_timer()
+
+        delta = dg.required_size(offset, len(payload), mf) - dg.size
+        if delta > 0 and not self._make_room(key, src, delta):
+            # 예산을 넘는 데이터그램은 버퍼를 늘리지 않고 통째로 버림
+            dropped = self._remove(key)
+            self.stats['rejected'] += 1
+            self.stats['rejected_bytes'] += dropped.size
+            self._abort(dropped)
+            return None, False
+
+        before = dg.size
+        added = dg.add(offset, payload, mf, now)
+        if not added:
+            self.stats['duplicates'] += 1
+        grown = dg.size - before
+        self.total_bytes += grown
+        self._src_bytes[src] += grown
+
+        self._lru.move_to_end(key)
+        self._by_src[src].move_to_end(key)
+        if dg.streaming and dg.calls:
+            self._pending.append(dg)
+
+        if dg.complete:
+            self._remove(key)
+            self.stats['completed'] += 1
+            self._completed[key] = now
+            self._completed.move_to_end(key)
+            if len(self._completed) > self.COMPLETED_MAX:
+                self._completed.popitem(last=False)
+        return dg, added
+
+    def expire(self, now=None):
+        """만료 검사 (타이머가 주기적으로 호출)"""
+        with self._lock:
+            self._expire(now if now is not None else time.monotonic())
+            pending = self._take_pending()
+        for dg in pending:
+            dg.run_calls()
+
+    # ==== 만료 타이머 ============================================================
+    def _ensure_timer(self):
+        """(self._lock 안에서) 재조립 중인 것이 생기면 만료 타이머 시작"""
+        if self._timer is None:
+            self._stop.clear()
+            self._timer = threading.Thread(target=self._timer_loop, daemon=True)
+            self._timer.start()
+
+    def _timer_loop(self):
+        while not self._stop.wait(min(1.0, self.timeout / 4)):
+            self.expire()
+            with self._lock:
+                if not self._lru or self._stop.is_set():
+                    # 비었으면 종료 (다음 add에서 다시 시작)
+                    self._timer = None
+                    return
+        with self._lock:
+            if self._timer is threading.current_thread():
+                self._timer = None
+
+    def close(self):
+        """만료 타이머 종료"""
+        self._stop.set()
+        with self._lock:
+            timer = self._timer
+        if timer is not None and timer is not threading.current_thread():
+            timer.join()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['active'] = len(self._lru)
+            stats['bytes'] = self.total_bytes
+            stats['sources'] = len(self._by_src)
+        return stats
@@ -0,0 +1,336 @@
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+# IP 헤더 마지막 바이트(flags)
+FLAG_MF = 0x01        # 뒤에 조각이 더 있음
+FLAG_RELIABLE = 0x02  # 수신 측이 ACK를 보내야 하는 조각
+
+# ACK 페이로드: [pkt_id(2)][cum(4)][received(4)][SACK 비트맵...]
+#   cum      : 0..cum-1 번째 조각은 모두 수신
+#   received : 지금까지 받은 조각 수
+#   비트맵   : cum 번째 조각부터 1비트씩 (MSB 먼저), 1이면 수신
+ACK_HEADER = struct.Struct('!HII')
+MAX_SACK_FRAGS = 8 * 1024
+
+# 송신 큐에서 기다리는 중인 조각의 송신 순번 (손실 판단에서 제외)
+_UNSENT = 1 << 62
+
+
+class RttEstimator:
+    """RFC 6298 재전송 타이머 (SRTT/RTTVAR, 지수 백오프)"""
+    RTO_INIT = 1.0
+    RTO_MIN = 0.2
+    RTO_MAX = 10.0
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = None
+        self.rto = self.RTO_INIT
+
+    def sample(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(self.RTO_MAX, max(self.RTO_MIN, self.srtt + 4 * self.rttvar))
+
+    def backoff(self):
+        self.rto = min(self.RTO_MAX, self.rto * 2)
+
+
+class _SendSession:
+    """데이터그램 하나의 송신 창 상태"""
+    __slots__ = ('pkt_id', 'dst_ip', 'n', 'acked', 'acked_count', 'sent_ts', 'retx',
+                 'seq', 'next_seq', 'highest_seq', 'base', 'next_new', 'cv', 'last_progress')
+
+    def __init__(self, pkt_id, dst_ip, n):
+        self.pkt_id = pkt_id
+        self.dst_ip = dst_ip
+        self.n = n
+        self.acked = bytearray(n)
+        self.acked_count = 0
+        self.sent_ts = [0.0] * n
+        self.retx = bytearray(n)
+        self.seq = [0] * n         # 조각을 마지막으로 보낸 송신 순번
+        self.next_seq = 1
+        self.highest_seq = 0       # ACK로 확인된 조각 중 가장 늦게 보낸 것의 순번
+        self.base = 0              # 가장 앞의 미확인 조각
+        self.next_new = 0          # 아직 한 번도 안 보낸 첫 조각
+        self.cv = threading.Condition()
+        self.last_progress = time.monotonic()
+
+
+class ReliableTransport:
+    """선택적 재전송(Selective Repeat) 신뢰 전송 (IPLayer 보조 클래스)
+
+    송신: 조각에 FLAG_RELIABLE을 붙여 window개까지 내보내고, 수신 측 ACK의
+    누적 번호(cum)와 SACK 비트맵으로 확인된 조각을 지운다. 빠진 조각만
+    RTO 만료 또는 그 뒤에 보낸 조각이 DUP_THRESH개 이상 확인됐을 때(빠른 재전송) 다시 보낸다.
+    빠른 재전송 판단은 송신 순번 기준이라 재전송한 조각이 또 손실돼도 타이머를 기다리지 않는다.
+    수신: ACK_EVERY개마다, 순서가 어긋나거나 중복 조각이 오거나 완성됐을 때 ACK를 보낸다.
+    완성된 데이터그램은 잠시 기억해 두고 늦게 온 재전송에는 ACK만 다시 보낸다.
+    """
+    WINDOW = 256
+    ACK_EVERY = 16
+    DUP_THRESH = 3
+    MAX_RETX = 15
+    IDLE_TIMEOUT = 30.0   # 이 시간 동안 ACK 진행이 없으면 전송 실패
+
+    DONE_TTL = 60.0
+    DONE_MAX = 4096
+
+    def __init__(self, ip):
+        self.ip = ip
+        self.rtt = {}                  # dst_ip -> RttEstimator
+        self._sessions = {}            # (dst_ip, pkt_id) -> _SendSession
+        self._lock = threading.Lock()
+        self._done = OrderedDict()     # (src_ip, pkt_id) -> (조각 수, 완료 시각)
+        # 목적지별 다음 pkt_id. 수신 측은 완료한 ID를 DONE_TTL 동안 기억하므로 무작위 ID를 쓰면
+        # 새 데이터그램이 '이미 받음'으로 처리될 수 있어 순서대로 증가시킴 (시작값만 무작위)
+        self._next_id = {}
+        self.stats = {'sent': 0, 'retransmitted': 0, 'fast_retransmitted': 0,
+                      'timeouts': 0, 'acks_sent': 0, 'acks_received': 0, 'failed': 0}
+
+    # ==== 송신 ================================================================
+    def send(self, data, protocol, dst_ip, dst_mac, frag_size):
+        """모든 조각이 확인될 때까지 블록. 성공하면 True"""
+        ip = self.ip
+        total = len(data)
+        n = max(1, (total + frag_size - 1) // frag_size)
+        with self._lock:
+            pkt_id = self._alloc_id(dst_ip)
+            s = _SendSession(pkt_id, dst_ip, n)
+            key = (dst_ip, pkt_id)
+            self._sessions[key] = s
+            rtt = self.rtt.setdefault(dst_ip, RttEstimator())
+
+        def build(idx):
+            offset = idx * frag_size
+            chunk = data[offset : offset + frag_size]
+            flags = FLAG_RELIABLE | (FLAG_MF if idx < n - 1 else 0)
+            return ip.build_packet(dst_ip, protocol, pkt_id, offset, chunk, flags)
+
+        print(f"[IP] Reliable send ID:{pkt_id}, {n} fragments, window {self.WINDOW}")
+        try:
+            while True:
+                with s.cv:
+                    if s.acked_count >= s.n:
+                        break
+                    now = time.monotonic()
+                    if now - s.last_progress > self.IDLE_TIMEOUT:
+                        print(f"[IP] Reliable send ID:{pkt_id} failed: no ACK progress")
+                        self.stats['failed'] += 1
+                        return False
+                    todo, wait = self._collect(s, rtt, now)
+                    if not todo:
+                        s.cv.wait(wait)
+                        continue
+                    if max(s.retx[i] for i in todo) > self.MAX_RETX:
+                        print(f"[IP] Reliable send ID:{pkt_id} failed: too many retransmissions")
+                        self.stats['failed'] += 1
+                        return False
+
+                # 잠금 밖에서 스케줄러 큐에 넣음 (큐가 차 있으면 여기서 대기)
+                burst = max(1, ip.pacer.burst)
+                for i in range(0, len(todo), burst):
+                    part = todo[i : i + burst]
+                    pkts = [build(idx) for idx in part]
+                    ip.scheduler.submit(protocol, pkts, dst_mac, self._on_sent_cb(s, part))
+            print(f"[IP] Reliable send ID:{pkt_id} complete (rto {rtt.rto * 1000:.0f} ms)")
+            return True
+        finally:
+            with self._lock:
+                self._sessions.pop(key, None)
+
+    def _alloc_id(self, dst_ip):
+        """(self._lock 안에서) dst_ip로 보낼 다음 pkt_id (진행 중인 세션 ID는 건너뜀)"""
+        pkt_id = self._next_id.get(dst_ip)
+        if pkt_id is None:
+            pkt_id = self.ip.new_pkt_id()
+        while (dst_ip, pkt_id) in self._sessions:
+            pkt_id = (pkt_id + 1) & 0xFFFF
+        self._next_id[dst_ip] = (pkt_id + 1) & 0xFFFF
+        return pkt_id
+
+    @staticmethod
+    def _on_sent_cb(s, part):
+        """실제 송신 시각/순번 기록 (송신 스레드에서 호출)"""
+        def on_sent(ts):
+            with s.cv:
+                for idx in part:
+                    s.sent_ts[idx] = ts
+                    s.seq[idx] = s.next_seq
+                    s.next_seq += 1
+        return on_sent
+
+    def _collect(self, s, rtt, now):
+        """(s.cv 안에서) 이번에 보낼 조각 목록과, 없으면 기다릴 시간"""
+        todo = []
+        earliest = None
+        timed_out = False
+        limit = min(s.next_new, s.base + self.WINDOW)
+        acked, sent_ts, seq = s.acked, s.sent_ts, s.seq
+        lost_seq = s.highest_seq - self.DUP_THRESH
+        for idx in range(s.base, limit):
+            if acked[idx]:
+                continue
+            due = sent_ts[idx] + rtt.rto
+            if due <= now:
+                timed_out = True
+                todo.append(idx)
+                s.retx[idx] += 1
+                # 큐에서 기다리는 동안 다시 고르지 않도록 (실제 시각/순번은 on_sent에서)
+                sent_ts[idx] = now
+                seq[idx] = _UNSENT
+            elif seq[idx] <= lost_seq:
+                # 나중에 보낸 조각들은 도착했는데 이 조각만 빠짐 -> 타이머를 기다리지 않고 재전송
+                todo.append(idx)
+                s.retx[idx] += 1
+                self.stats['fast_retransmitted'] += 1
+                seq[idx] = _UNSENT
+                sent_ts[idx] = now
+            elif earliest is None or due < earliest:
+                earliest = due
+        if timed_out:
+            rtt.backoff()
+            self.stats['timeouts'] += 1
+        self.stats['retransmitted'] += len(todo)
+
+        # 창에 여유가 있으면 새 조각
+        end = min(s.n, s.base + self.WINDOW)
+        if s.next_new < end:
+            for idx in range(s.next_new, end):
+                sent_ts[idx] = now
+                seq[idx] = _UNSENT
+            todo.extend(range(s.next_new, end))
+            self.stats['sent'] += end - s.next_new
+            s.next_new = end
+
+        wait = 1.0 if earliest is None else max(0.001, earliest - now)
+        return todo, wait
+
+    def on_ack(self, src_ip, payload):
+        if len(payload) < ACK_HEADER.size:
+            return False
+        pkt_id, cum, _received = ACK_HEADER.unpack_from(payload, 0)
+        with self._lock:
+            s = self._sessions.get((src_ip, pkt_id))
+            rtt = self.rtt.get(src_ip)
+        if s is None:
+            return True
+        self.stats['acks_received'] += 1
+        bitmap = payload[ACK_HEADER.size:]
+        now = time.monotonic()
+
+        with s.cv:
+            acked, n = s.acked, s.n
+            newly = []
+            for idx in range(s.base, min(cum, n)):
+                if not acked[idx]:
+                    newly.append(idx)
+            for byte_i, b in enumerate(bitmap):
+                if not b:
+                    continue
+                for bit in range(8):
+                    if b & (0x80 >> bit):
+                        idx = cum + byte_i * 8 + bit
+                        if idx < n and not acked[idx]:
+                            newly.append(idx)
+            if not newly:
+                return True
+
+            # Karn 알고리즘: 재전송한 적 없는 조각 중 가장 최근에 보낸 것으로 RTT 측정
+            fresh = [s.sent_ts[i] for i in newly if not s.retx[i] and s.sent_ts[i]]
+            if fresh and rtt is not None:
+                rtt.sample(now - max(fresh))
+
+            for idx in newly:
+                acked[idx] = 1
+            s.acked_count += len(newly)
+            sent_seqs = [s.seq[i] for i in newly if s.seq[i] != _UNSENT]
+            if sent_seqs:
+                s.highest_seq = max(s.highest_seq, max(sent_seqs))
+            while s.base < n and acked[s.base]:
+                s.base += 1
+            s.last_progress = now
+            s.cv.notify()
+        return True
+
+    # ==== 수신 ================================================================
+    def is_done(self, key):
+        rec = self._done.get(key)
+        if rec is None:
+            return False
+        if time.monotonic() - rec[1] > self.DONE_TTL:
+            del self._done[key]
+            return False
+        return True
+
+    def on_done_duplicate(self, key, src_ip, src_mac):
+        """이미 완성한 데이터그램의 재전송 조각 -> 완료 ACK만 다시 보냄"""
+        n = self._done[key][0]
+        self._send_ack(src_ip, src_mac, key[1], n, n, b'')
+
+    def on_single(self, key, src_ip, src_mac):
+        """조각 하나짜리 신뢰 데이터그램 수신"""
+        self._remember(key, 1)
+        self._send_ack(src_ip, src_mac, key[1], 1, 1, b'')
+
+    def on_fragment(self, key, dg, offset, added, src_ip, src_mac):
+        """재조립 버퍼에 조각을 넣은 직후 호출 -> 필요하면 ACK 송신"""
+        fs = dg.frag_size
+        idx = offset // fs if fs else -1
+        in_order = idx == dg.ack_highest + 1
+        if idx > dg.ack_highest:
+            dg.ack_highest = idx
+
+        if added:
+            dg.ack_unacked += 1
+        if dg.complete:
+            n = len(dg.seen) if fs else 1
+            self._remember(key, n)
+        elif added and in_order and dg.ack_unacked < self.ACK_EVERY:
+            return
+        dg.ack_unacked = 0
+        self._send_dg_ack(dg, src_ip, src_mac)
+
+    def _send_dg_ack(self, dg, src_ip, src_mac):
+        seen = dg.seen
+        if dg.complete:
+            cum = len(seen) if dg.frag_size else 1
+            self._send_ack(src_ip, src_mac, dg.pkt_id, cum, dg.count, b'')
+            return
+        cum = seen.find(0)
+        if cum < 0:
+            cum = len(seen)
+        window = seen[cum : cum + MAX_SACK_FRAGS]
+        bitmap = bytearray((len(window) + 7) // 8)
+        i = window.find(1)
+        while i >= 0:
+            bitmap[i >> 3] |= 0x80 >> (i & 7)
+            i = window.find(1, i + 1)
+        self._send_ack(src_ip, src_mac, dg.pkt_id, cum, dg.count, bytes(bitmap))
+
+    def _send_ack(self, dst_ip, dst_mac, pkt_id, cum, received, bitmap):
+        ip = self.ip
+        payload = ACK_HEADER.pack(pkt_id, cum, received) + bitmap
+        pkt = ip.build_packet(dst_ip, ip.PROTOCOL_ACK, ip.new_pkt_id(), 0, payload, 0)
+        self.stats['acks_sent'] += 1
+        ip.scheduler.submit(ip.PROTOCOL_ACK, [pkt], dst_mac)
+
+    def _remember(self, key, n):
+        done = self._done
+        done[key] = (n, time.monotonic())
+        done.move_to_end(key)
+        while len(done) > self.DONE_MAX:
+            done.popitem(last=False)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['rto_ms'] = {'.'.join(str(b) for b in ip): round(r.rto * 1000, 1)
+                           for ip, r in self.rtt.items()}
+        return stats
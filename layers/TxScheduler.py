@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import deque
+
+
+class _TxUnit:
+    """한 번에 내보낼 패킷 묶음 (같은 목적지)"""
+    __slots__ = ('packets', 'nbytes', 'dst_mac', 'on_sent', 'enq_ts', 'done')
+
+    def __init__(self, packets, dst_mac, on_sent):
+        self.packets = packets
+        self.nbytes = sum(len(p) for p in packets)
+        self.dst_mac = dst_mac
+        self.on_sent = on_sent
+        self.enq_ts = time.monotonic()
+        self.done = threading.Event()
+
+
+class _TxClass:
+    __slots__ = ('name', 'priority', 'weight', 'limit', 'queue', 'deficit', 'stats')
+
+    def __init__(self, name, priority, weight, limit):
+        self.name = name
+        self.priority = priority
+        self.weight = weight
+        self.limit = limit      # 대기 가능한 묶음 수 (0이면 무제한)
+        self.queue = deque()
+        self.deficit = 0
+        self.stats = {'enqueued': 0, 'sent_units': 0, 'sent_packets': 0, 'sent_bytes': 0,
+                      'depth': 0, 'max_depth': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+
+
+class TxScheduler:
+    """IPLayer 송신 스케줄러 (송신 스레드 하나가 클래스별 큐에서 꺼내 전송)
+
+    - POLICY_PRIORITY: priority 값이 작은 클래스부터 (같으면 등록 순서)
+    - POLICY_DRR: weight에 비례해 바이트를 나눠 쓰는 Deficit Round Robin
+      (priority 0 클래스(ACK 등 제어용)는 정책과 관계없이 항상 먼저)
+    큐가 가득 찬 클래스에 넣으면 자리가 날 때까지 기다리므로 큰 파일 전송이
+    큐를 독점하지 못하고, 채팅 같은 짧은 메시지는 현재 묶음 직후에 나간다.
+    모든 전송은 pacer를 거친다.
+    """
+    POLICY_PRIORITY = 'priority'
+    POLICY_DRR = 'drr'
+
+    DRR_QUANTUM = 1500 * 4
+
+    def __init__(self, send_func, pacer_func, policy=POLICY_PRIORITY):
+        self._send = send_func       # (packets, dst_mac) -> bool
+        self._pacer = pacer_func     # () -> Pacer (IPLayer.set_pacing으로 바뀔 수 있음)
+        self.policy = policy
+        self._classes = {}           # 클래스 이름 -> _TxClass
+        self._proto_class = {}       # protocol -> 클래스 이름
+        self._order = []             # DRR 순회 순서
+        self._rr = 0
+        self._rr_fresh = True
+        self._cv = threading.Condition()
+        self._thread = None
+
+    def add_class(self, name, priority=1, weight=1, limit=64):
+        with self._cv:
+            cls = self._classes.get(name)
+            if cls is None:
+                cls = self._classes[name] = _TxClass(name, priority, weight, limit)
+                self._order.append(cls)
+            else:
+                cls.priority, cls.weight, cls.limit = priority, weight, limit
+            self._order.sort(key=lambda c: c.priority)
+            self._cv.notify_all()
+
+    def map_protocol(self, protocol, name):
+        self._proto_class[protocol] = name
+
+    def set_policy(self, policy):
+        with self._cv:
+            self.policy = policy
+            self._cv.notify_all()
+
+    def _class_for(self, protocol):
+        name = self._proto_class.get(protocol, 'default')
+        cls = self._classes.get(name)
+        if cls is None:
+            self.add_class(name)
+            cls = self._classes[name]
+        return cls
+
+    # ==== 송신 요청 ============================================================
+    def submit(self, protocol, packets, dst_mac=None, on_sent=None):
+        """패킷 묶음을 큐에 넣음. 큐가 가득 차면 대기. 반환값 unit.done으로 전송 완료 확인
+
+        on_sent(ts)는 실제로 내보내기 직전에 송신 스레드에서 호출된다.
+        """
+        unit = _TxUnit(packets, dst_mac, on_sent)
+        self._ensure_thread()
+        with self._cv:
+            cls = self._class_for(protocol)
+            while cls.limit and len(cls.queue) >= cls.limit:
+                self._cv.wait()
+            unit.enq_ts = time.monotonic()
+            cls.queue.append(unit)
+            st = cls.stats
+            st['enqueued'] += 1
+            st['depth'] = len(cls.queue)
+            st['max_depth'] = max(st['max_depth'], st['depth'])
+            self._cv.notify_all()
+        return unit
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._cv:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._tx_loop, daemon=True)
+                    self._thread.start()
+
+    # ==== 송신 스레드 ==========================================================
+    def _pick(self):
+        """(self._cv 안에서) 다음에 보낼 (클래스, 묶음). 없으면 None"""
+        active = [c for c in self._order if c.queue]
+        if not active:
+            return None
+        if self.policy == self.POLICY_DRR and active[0].priority > 0:
+            order = [c for c in self._order if c.priority > 0]
+            while True:
+                cls = order[self._rr % len(order)]
+                if not cls.queue:
+                    cls.deficit = 0
+                    self._rr += 1
+                    self._rr_fresh = True
+                    continue
+                if self._rr_fresh:
+                    # 차례가 올 때마다 weight만큼 몫을 더해 줌
+                    cls.deficit += self.DRR_QUANTUM * cls.weight
+                    self._rr_fresh = False
+                unit = cls.queue[0]
+                if cls.deficit >= unit.nbytes:
+                    cls.deficit -= unit.nbytes
+                    return cls, cls.queue.popleft()
+                # 이번 차례 몫을 다 씀 -> 다음 클래스로
+                self._rr += 1
+                self._rr_fresh = True
+        cls = active[0]
+        return cls, cls.queue.popleft()
+
+    def _tx_loop(self):
+        while True:
+            with self._cv:
+                picked = self._pick()
+                while picked is None:
+                    self._cv.wait()
+                    picked = self._pick()
+                cls, unit = picked
+                cls.stats['depth'] = len(cls.queue)
+                # 큐에 자리가 났으니 기다리던 송신자 깨움
+                self._cv.notify_all()
+
+            self._pacer().acquire(len(unit.packets), unit.nbytes)
+            now = time.monotonic()
+            wait = now - unit.enq_ts
+            try:
+                if unit.on_sent:
+                    unit.on_sent(now)
+                self._send(unit.packets, unit.dst_mac)
+            except Exception as e:
+                print(f'[IP] TX error ({cls.name}): {e}')
+            finally:
+                unit.done.set()
+
+            with self._cv:
+                st = cls.stats
+                st['sent_units'] += 1
+                st['sent_packets'] += len(unit.packets)
+                st['sent_bytes'] += unit.nbytes
+                st['wait_total'] += wait
+                st['wait_max'] = max(st['wait_max'], wait)
+
+    def get_stats(self):
+        """클래스별 큐 길이와 대기 시간 (ms)"""
+        out = {}
+        with self._cv:
+            for name, cls in self._classes.items():
+                st = dict(cls.stats)
+                n = st['sent_units']
+                wait_total = st.pop('wait_total')
+                st['wait_avg_ms'] = round(wait_total / n * 1000, 3) if n else 0.0
+                st['wait_max_ms'] = round(st.pop('wait_max') * 1000, 3)
+                st['priority'] = cls.priority
+                st['weight'] = cls.weight
+                out[name] = st
+        return out
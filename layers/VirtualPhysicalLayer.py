@@ -0,0 +1,182 @@
+import threading
+import queue
+import time
+import itertools
+from .BaseLayer import BaseLayer
+
+BROADCAST_MAC = b'\xFF' * 6
+
+
+class VirtualSwitch:
+    """프로세스 내부 가상 L2 스위치
+
+    VirtualPhysicalLayer 포트들을 연결하고, 출발지 MAC을 학습해서
+    유니캐스트는 해당 포트로, 브로드캐스트/미학습 목적지는 전체 포트로 보낸다.
+    """
+    def __init__(self, name='vswitch'):
+        self.name = name
+        self.ports = {}      # iface -> VirtualPhysicalLayer
+        self.mac_table = {}  # mac(bytes) -> VirtualPhysicalLayer
+        self.lock = threading.Lock()
+        self._ids = itertools.count()
+        self.stats = {'frames': 0, 'bytes': 0, 'flooded': 0, 'unknown_port': 0}
+
+    def new_iface_name(self):
+        return f'{self.name}-veth{next(self._ids)}'
+
+    def attach(self, port):
+        with self.lock:
+            self.ports[port.iface] = port
+
+    def detach(self, port):
+        with self.lock:
+            if self.ports.get(port.iface) is port:
+                del self.ports[port.iface]
+            for mac in [m for m, p in self.mac_table.items() if p is port]:
+                del self.mac_table[mac]
+
+    def forward(self, src_port, frame: bytes):
+        if len(frame) < 14:
+            return False
+        dst = frame[0:6]
+        src = frame[6:12]
+        now = time.monotonic()
+        with self.lock:
+            self.stats['frames'] += 1
+            self.stats['bytes'] += len(frame)
+            self.mac_table[src] = src_port
+            # 송신 포트 링크 직렬화 시간
+            t_in = src_port._reserve_tx(now, len(frame))
+
+            if dst == BROADCAST_MAC or dst not in self.mac_table:
+                self.stats['flooded'] += 1
+                targets = [p for p in self.ports.values() if p is not src_port]
+            else:
+                targets = [self.mac_table[dst]]
+                if targets[0].iface not in self.ports:
+                    self.stats['unknown_port'] += 1
+                    return False
+
+            for port in targets:
+                port._schedule_rx(t_in + src_port.latency, frame)
+        return True
+
+
+class VirtualPhysicalLayer(BaseLayer):
+    """VirtualSwitch에 연결되는 가상 물리 계층 (권한/NIC/scapy 불필요)
+
+    PhysicalLayer와 같은 인터페이스(send, send_many, set_iface, start, stop)를
+    제공하므로 main.py의 상위 계층 구성을 그대로 얹어 부하 테스트를 할 수 있다.
+    bandwidth_bps(포트 링크 속도, None=무제한)와 latency(초, 단방향)로 링크 특성을 흉내낸다.
+    mtu보다 큰 프레임은 실제 NIC처럼 수신 포트에서 버린다.
+
+    ARP 프레임도 EthernetLayer.send_raw를 거쳐 이 계층으로 나가므로 가상 링크에서도
+    request/reply/gratuitous가 동작한다.
+    """
+    def __init__(self, switch: VirtualSwitch, iface: str = None,
+                 bandwidth_bps: float = None, latency: float = 0.0,
+                 queue_limit: int = 100000, mtu: int = 1500):
+        super().__init__()
+        self.switch = switch
+        self.iface = iface or switch.new_iface_name()
+        self.bandwidth_bps = bandwidth_bps
+        self.latency = latency
+        self.mtu = mtu
+
+        self._rxq = queue.Queue(maxsize=queue_limit)
+        self._t = None
+        self._stop = threading.Event()
+        # 링크 직렬화가 끝나는 시각 (switch.lock 안에서만 갱신)
+        self._tx_free = 0.0
+        self._rx_free = 0.0
+
+        self.stats = {'tx_frames': 0, 'tx_bytes': 0, 'rx_frames': 0,
+                      'rx_bytes': 0, 'rx_drops': 0, 'rx_oversize': 0}
+        switch.attach(self)
+
+    def get_mtu(self):
+        return self.mtu
+
+    def set_iface(self, iface: str):
+        if iface == self.iface:
+            return
+        self.switch.detach(self)
+        self.iface = iface
+        self.switch.attach(self)
+        print(f'[VPHY] Interface set to "{iface}".')
+
+    # ==== 링크 모델 (switch.lock 안에서 호출) ====================================
+    def _serialize_time(self, size):
+        if not self.bandwidth_bps:
+            return 0.0
+        return size * 8 / self.bandwidth_bps
+
+    def _reserve_tx(self, now, size):
+        self._tx_free = max(now, self._tx_free) + self._serialize_time(size)
+        return self._tx_free
+
+    def _schedule_rx(self, t_arrive, frame):
+        if len(frame) - 14 > self.mtu:
+            self.stats['rx_oversize'] += 1
+            return
+        self._rx_free = max(t_arrive, self._rx_free) + self._serialize_time(len(frame))
+        try:
+            self._rxq.put_nowait((self._rx_free + self.latency, frame))
+        except queue.Full:
+            self.stats['rx_drops'] += 1
+
+    # ==== 송신 ================================================================
+    def send(self, frame: bytes):
+        frame = bytes(frame)
+        self.stats['tx_frames'] += 1
+        self.stats['tx_bytes'] += len(frame)
+        return self.switch.forward(self, frame)
+
+    def send_many(self, frames):
+        ok = True
+        for frame in frames:
+            ok = self.send(frame) and ok
+        return ok
+
+    # ==== 수신 ================================================================
+    def _rx_loop(self):
+        while not self._stop.is_set():
+            try:
+                due, frame = self._rxq.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            # 포트별 도착 시각은 단조 증가하므로 FIFO 큐로 충분함
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.stats['rx_frames'] += 1
+            self.stats['rx_bytes'] += len(frame)
+            if self.upper:
+                try:
+                    self.upper.recv(frame)
+                except Exception as e:
+                    print(f'[VPHY] upper recv error on {self.iface}: {e}')
+
+    def start(self):
+        if self._t and self._t.is_alive():
+            return
+        self.running = True
+        self._stop.clear()
+        self._t = threading.Thread(target=self._rx_loop, daemon=True)
+        self._t.start()
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
+        if self._t:
+            self._t.join(timeout=1)
+            self._t = None
+
+    def close(self):
+        self.stop()
+        self.switch.detach(self)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['rx_queue'] = self._rxq.qsize()
+        return stats
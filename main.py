@@ -15,7 +15,8 @@ file_app = FileAppLayer() # 추가
 ip_layer = IPLayer()
 arp = ARPLayer()
 eth = EthernetLayer()
-phy = PhysicalLayer(iface=iface)
+# Linux에서는 backend=PhysicalLayer.BACKEND_AF_PACKET 으로 커널 필터 수신 사용 가능
+phy = PhysicalLayer(iface=iface, backend=PhysicalLayer.BACKEND_SCAPY)
 
 # 계층 연결
 # 1. App Layer들 -> IP Layer (하위 연결)
@@ -25,6 +26,11 @@ file_app.set_lower(ip_layer)
 # 2. IP Layer -> App Layer들 (상위 등록 - 프로토콜 ID 사용)
 ip_layer.register_upper(IPLayer.PROTOCOL_CHAT, chat_app)
 ip_layer.register_upper(IPLayer.PROTOCOL_FILE, file_app)
+# 파일을 ACK/선택적 재전송으로 보내려면 (손실 있는 무선 환경에서도 전체 재전송 없이 완료).
+# 조각 flags에 FLAG_RELIABLE이 붙으므로 상대도 이 기능을 지원할 때만 켤 것:
+# ip_layer.set_reliable(IPLayer.PROTOCOL_FILE, True)
+# 파일은 전체를 메모리에 모으지 않고 받는 대로 디스크에 기록
+ip_layer.set_streaming(IPLayer.PROTOCOL_FILE, True)
 
 # 3. IP -> ARP -> Eth -> Phy (기존과 동일)
 ip_layer.set_lower(arp)
@@ -33,6 +39,16 @@ arp.set_lower(eth)
 eth.set_upper(arp)
 eth.set_lower(phy)
 phy.set_upper(eth)
+# 짧은 채팅/삭제 메시지가 몰릴 때 프레임 수를 줄이려면 (상대도 0xFFFE 수신 지원 필요):
+# eth.enable_coalescing(max_delay=0.002)
+# 파일 전송 속도 (기본 5000 조각/s). 링크 속도에 맞춰 조정하고 ip_layer.get_pacing_stats()로 확인:
+# ip_layer.set_pacing(rate_bps=100_000_000, burst=32)
+# 송신 스케줄러: 기본은 엄격한 우선순위(제어 > 채팅 > 파일). 가중치 분배를 원하면:
+# from layers.TxScheduler import TxScheduler
+# ip_layer.set_tx_policy(TxScheduler.POLICY_DRR); 큐 길이/대기 시간은 ip_layer.get_tx_stats()
+# 같은 서브넷의 피어 찾기 (ARP 캐시에도 채워짐):
+# from layers.ARPDiscovery import ARPDiscovery
+# ARPDiscovery(arp).start('192.168.0.0/22', on_host=lambda ip, mac: print(ip, mac))
 
 # GUI 연결
 gui.attach_arp(arp)
@@ -44,7 +60,7 @@ gui.set_chat_app(chat_app)
 # Device Change 핸들러
 def on_dev_change(selected_if, mac_str, ip_str):
     print(f"\n[Main] Device Change: {selected_if}")
-    phy.set_iface(selected_if)
+    phy.set_iface(selected_if, make_before_break=True)
 
     try:
         if mac_str:
@@ -63,6 +79,8 @@ def on_dev_change(selected_if, mac_str, ip_str):
 
         # ARP 초기화
         arp.set_src_info(ip_bytes, mac)
+        # 이 인터페이스에서 지난번에 알던 이웃을 복원 (STALE로 바로 쓰고 뒤에서 재확인)
+        arp.enable_snapshot(selected_if)
         arp.send_gratuitous()
         arp.add_proxy_entry(b'\xC0\xA8\x00\x64', mac)
 
@@ -75,4 +93,6 @@ gui.set_on_device_change(on_dev_change)
 # BaseLayer 구조상 start()는 최하위부터 연쇄적으로 불리지 않을 수 있으니 명시적 시작
 phy.start()
 gui.run()
+chat_app.close()
+arp.close()
 phy.stop()
\ No newline at end of file